@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,10 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def sync_background_jobs(settings):
+    # Фоновые потоки (миниатюры, ленты подписчиков) обращаются к тестовой
+    # базе и MEDIA_ROOT параллельно с тестами.
+    settings.BACKGROUND_WORKERS = 0
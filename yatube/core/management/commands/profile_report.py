@@ -0,0 +1,73 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import profiler
+
+
+class Command(BaseCommand):
+    help = ('Сводка профилей запросов из PROFILER_DIR: самые горячие '
+            'функции каждого представления.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            default=settings.PROFILER_DIR,
+            help='Каталог профилей (по умолчанию PROFILER_DIR).',
+        )
+        parser.add_argument('--view', help='Только это представление.')
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Сколько функций выводить для представления.',
+        )
+        parser.add_argument(
+            '--sort',
+            choices=('self', 'cumulative'),
+            default='self',
+            help='self — время в самой функции, cumulative — вместе '
+                 'с вызванными.',
+        )
+
+    def handle(self, *args, **options):
+        views = defaultdict(lambda: {
+            'profiles': 0,
+            'duration': 0.0,
+            'samples': 0,
+            'self': Counter(),
+            'cumulative': Counter(),
+        })
+        for profile in profiler.load(options['dir']):
+            if options['view'] and profile['view'] != options['view']:
+                continue
+            view = views[profile['view']]
+            view['profiles'] += 1
+            view['duration'] += profile['duration']
+            for stack, count in profile['stacks'].items():
+                functions = stack.split(';') if stack else ['<root>']
+                view['samples'] += count
+                view['self'][functions[-1]] += count
+                for function in set(functions):
+                    view['cumulative'][function] += count
+        if not views:
+            self.stdout.write('Профилей нет.')
+            return
+        for name, view in sorted(
+            views.items(), key=lambda item: -item[1]['duration'],
+        ):
+            self.stdout.write(
+                f'== {name}: профилей {view["profiles"]}, выборок '
+                f'{view["samples"]}, среднее время '
+                f'{view["duration"] / view["profiles"]:.3f} с'
+            )
+            self.stdout.write(f'{"self%":>7} {"cum%":>7}  функция')
+            total = view['samples'] or 1
+            hot = view[options['sort']].most_common(options['top'])
+            for function, _ in hot:
+                self.stdout.write(
+                    f'{view["self"][function] / total:>7.1%} '
+                    f'{view["cumulative"][function] / total:>7.1%}  '
+                    f'{function}'
+                )
@@ -0,0 +1,77 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import querylog
+from core.stats import percentile
+
+SORT_KEYS = {
+    'time': lambda entry: entry['time'],
+    'count': lambda entry: entry['count'],
+    'p95': lambda entry: entry['p95'],
+    'n_plus_one': lambda entry: (entry['n_plus_one'], entry['time']),
+}
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала запросов к базе по отпечаткам SQL '
+            'и представлениям. p50 и p95 считаются по выборкам процессов, '
+            'объединенным без весов, и смещены к малонагруженным процессам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            default=settings.QUERYLOG_DIR,
+            help='Каталог журнала (по умолчанию QUERYLOG_DIR).',
+        )
+        parser.add_argument('--view', help='Только это представление.')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--sort',
+            choices=sorted(SORT_KEYS),
+            default='time',
+            help='time — суммарное время, count — число выполнений, '
+                 'p95 — 95-й перцентиль, n_plus_one — запросы с N+1.',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Удалить прочитанные файлы журнала. '
+                 'Процессы пишут в файлы только прирост статистики, так что '
+                 'следующая сводка начнется с нуля.',
+        )
+
+    def handle(self, *args, **options):
+        paths = querylog.log_files(options['dir'])
+        rows = []
+        for (view, key), entry in querylog.load(paths).items():
+            if options['view'] and view != options['view']:
+                continue
+            samples = sorted(entry['samples'])
+            rows.append({
+                **entry,
+                'view': view,
+                'fingerprint': key,
+                'p50': percentile(samples, 0.5) if samples else 0,
+                'p95': percentile(samples, 0.95) if samples else 0,
+            })
+        if options['reset']:
+            for path in paths:
+                os.remove(path)
+        if not rows:
+            self.stdout.write('Журнал пуст.')
+            return
+        rows.sort(key=SORT_KEYS[options['sort']], reverse=True)
+        self.stdout.write(
+            f'{"всего, мс":>10} {"раз":>7} {"p50, мс":>8} {"p95, мс":>8} '
+            f'{"max, мс":>8} {"N+1":>5} {"дубли":>6}  представление: SQL'
+        )
+        for row in rows[:options['top']]:
+            self.stdout.write(
+                f'{row["time"] * 1000:>10.1f} {row["count"]:>7} '
+                f'{row["p50"] * 1000:>8.2f} {row["p95"] * 1000:>8.2f} '
+                f'{row["max"] * 1000:>8.2f} {row["n_plus_one"]:>5} '
+                f'{row["duplicates"]:>6}  '
+                f'{row["view"]}: {row["fingerprint"][:200]}'
+            )
@@ -0,0 +1,201 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+_current = contextvars.ContextVar('metrics_sample', default=None)
+
+_lock = threading.Lock()
+
+REQUESTS = Counter()
+DURATION_BUCKETS = defaultdict(Counter)
+DURATION_SUMS = Counter()
+SAMPLED = Counter()
+SAMPLED_VALUES = Counter()
+EVENTS = Counter()
+
+_collectors = []
+
+
+class RequestSample:
+    """Подробные замеры одного выбранного для сэмплинга запроса.
+
+    Экземпляр служит оберткой execute для подключений к базе и копит
+    число и время запросов, время отрисовки шаблонов и события вроде
+    попаданий в кеш.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.events = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def server_timing(self, duration):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        metrics = [
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+        ]
+        if self.events:
+            events = ' '.join(
+                f'{event}={number}'
+                for event, number in sorted(self.events.items())
+            )
+            metrics.append(f'cache;desc="{events}"')
+        metrics.append(f'total;dur={duration * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+def start_sample(sample):
+    return _current.set(sample)
+
+
+def finish_sample(token):
+    _current.reset(token)
+
+
+def current_sample():
+    return _current.get()
+
+
+def count(event, number=1):
+    """Учитывает событие в замерах текущего запроса, если он выбран."""
+    sample = _current.get()
+    if sample is not None:
+        sample.events[event] += number
+
+
+def add_template_time(seconds):
+    sample = _current.get()
+    if sample is not None:
+        sample.template_time += seconds
+
+
+def observe(view, method, status, duration, sample=None):
+    """Добавляет запрос в агрегированные метрики процесса."""
+    bucket = bisect.bisect_left(settings.METRICS_BUCKETS, duration)
+    with _lock:
+        REQUESTS[view, method, status] += 1
+        DURATION_BUCKETS[view][bucket] += 1
+        DURATION_SUMS[view] += duration
+        if sample is not None:
+            SAMPLED[view] += 1
+            SAMPLED_VALUES[view, 'db_queries'] += sample.queries
+            SAMPLED_VALUES[view, 'db_seconds'] += sample.db_time
+            SAMPLED_VALUES[view, 'template_seconds'] += sample.template_time
+            for event, number in sample.events.items():
+                EVENTS[view, event] += number
+
+
+def register_collector(name, description, collect):
+    """Добавляет в вывод счетчик процесса с меткой event.
+
+    collect возвращает словарь событие → значение, например
+    page_cache_stats.
+    """
+    _collectors.append((name, description, collect))
+
+
+def reset():
+    with _lock:
+        for metric in (REQUESTS, DURATION_BUCKETS, DURATION_SUMS, SAMPLED,
+                       SAMPLED_VALUES, EVENTS):
+            metric.clear()
+
+
+def _labels(**labels):
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'),
+        )
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _metric(lines, name, kind, description):
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def render():
+    """Метрики процесса в текстовом формате Prometheus."""
+    with _lock:
+        requests = dict(REQUESTS)
+        buckets = {view: dict(counts)
+                   for view, counts in DURATION_BUCKETS.items()}
+        sums = dict(DURATION_SUMS)
+        sampled = dict(SAMPLED)
+        values = dict(SAMPLED_VALUES)
+        events = dict(EVENTS)
+    lines = []
+    _metric(lines, 'yatube_requests_total', 'counter',
+            'Запросы по представлению, методу и статусу.')
+    for (view, method, status), number in sorted(requests.items()):
+        labels = _labels(view=view, method=method, status=status)
+        lines.append(f'yatube_requests_total{labels} {number}')
+
+    _metric(lines, 'yatube_request_duration_seconds', 'histogram',
+            'Время обработки запроса.')
+    bounds = [*map(str, settings.METRICS_BUCKETS), '+Inf']
+    for view in sorted(buckets):
+        total = 0
+        for index, bound in enumerate(bounds):
+            total += buckets[view].get(index, 0)
+            labels = _labels(view=view, le=bound)
+            lines.append(
+                f'yatube_request_duration_seconds_bucket{labels} {total}'
+            )
+        labels = _labels(view=view)
+        lines.append(
+            f'yatube_request_duration_seconds_sum{labels} {sums[view]}'
+        )
+        lines.append(
+            f'yatube_request_duration_seconds_count{labels} {total}'
+        )
+
+    _metric(lines, 'yatube_sampled_requests_total', 'counter',
+            'Запросы с подробными замерами.')
+    for view, number in sorted(sampled.items()):
+        lines.append(
+            f'yatube_sampled_requests_total{_labels(view=view)} {number}'
+        )
+    for name, description in (
+        ('db_queries', 'Запросы к базе в сэмплированных запросах.'),
+        ('db_seconds', 'Время запросов к базе в сэмплированных запросах.'),
+        ('template_seconds',
+         'Время отрисовки шаблонов в сэмплированных запросах.'),
+    ):
+        _metric(lines, f'yatube_sampled_{name}_total', 'counter',
+                description)
+        for view in sorted(sampled):
+            lines.append(
+                f'yatube_sampled_{name}_total{_labels(view=view)} '
+                f'{values.get((view, name), 0)}'
+            )
+    _metric(lines, 'yatube_sampled_cache_events_total', 'counter',
+            'События кешей в сэмплированных запросах.')
+    for (view, event), number in sorted(events.items()):
+        labels = _labels(view=view, event=event)
+        lines.append(f'yatube_sampled_cache_events_total{labels} {number}')
+
+    for name, description, collect in _collectors:
+        _metric(lines, name, 'counter', description)
+        for event, number in sorted(collect().items()):
+            lines.append(f'{name}{_labels(event=event)} {number}')
+    return '\n'.join(lines) + '\n'
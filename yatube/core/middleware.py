@@ -0,0 +1,132 @@
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+from . import metrics, profiler, querylog
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class MetricsMiddleware:
+    """Метрики производительности запросов.
+
+    Время ответа каждого запроса попадает в гистограмму по имени
+    представления. Для доли METRICS_SAMPLE_RATE запросов дополнительно
+    считаются запросы к базе и их время, время отрисовки шаблонов
+    и события кешей, а в ответ добавляется заголовок Server-Timing.
+    Остальные запросы обходятся без оберток, поэтому накладные расходы
+    не превышают нескольких микросекунд.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            response = self.get_response(request)
+            metrics.observe(
+                view_name(request), request.method, response.status_code,
+                time.perf_counter() - started,
+            )
+            return response
+
+        sample = metrics.RequestSample()
+        token = metrics.start_sample(sample)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            metrics.finish_sample(token)
+        duration = time.perf_counter() - started
+        metrics.observe(
+            view_name(request), request.method, response.status_code,
+            duration, sample,
+        )
+        response['Server-Timing'] = sample.server_timing(duration)
+        return response
+
+    def process_template_response(self, request, response):
+        if metrics.current_sample() is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda response: metrics.add_template_time(
+                    time.perf_counter() - started,
+                )
+            )
+        return response
+
+
+class ProfilerMiddleware:
+    """Профили медленных и случайно выбранных запросов.
+
+    Включается настройкой PROFILER_ENABLED. Пока запрос выполняется,
+    фоновый поток каждые PROFILER_INTERVAL секунд снимает стек его
+    потока. Профиль сохраняется в PROFILER_DIR, если запрос длился
+    дольше PROFILER_SLOW_THRESHOLD или попал в долю PROFILER_SAMPLE_RATE;
+    сводку по представлениям строит команда profile_report.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = random.random() < settings.PROFILER_SAMPLE_RATE
+        started = time.perf_counter()
+        profiler.start(sys._getframe())
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = profiler.stop()
+        duration = time.perf_counter() - started
+        if sampled or duration >= settings.PROFILER_SLOW_THRESHOLD:
+            profiler.save(
+                profile,
+                view=view_name(request),
+                method=request.method,
+                path=request.get_full_path(),
+                status=response.status_code,
+                duration=duration,
+                reason='sample' if sampled else 'slow',
+                created=timezone.now().isoformat(),
+            )
+        return response
+
+
+class QueryLogMiddleware:
+    """Журнал запросов к базе с отпечатками и поиском N+1.
+
+    Для доли QUERYLOG_SAMPLE_RATE запросов все обращения к базе
+    сводятся по отпечаткам SQL и представлению; медленные запросы
+    пишутся в лог. Сводку по всем процессам выводит query_report.
+    При нулевой доле middleware отключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERYLOG_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.QUERYLOG_SAMPLE_RATE:
+            return self.get_response(request)
+        queries = querylog.RequestQueries()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        querylog.record(view_name(request), queries)
+        return response
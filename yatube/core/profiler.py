@@ -0,0 +1,126 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+
+_lock = threading.Lock()
+
+_active = {}
+
+_sampler = None
+
+
+class RequestProfile:
+    """Стеки потока одного запроса, снятые семплером.
+
+    Стек записывается строкой «функция;функция;…» от корня к листу,
+    начиная с кадра под root, — в формате folded stacks для флеймграфов.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.stacks = Counter()
+        self.samples = 0
+
+    def add(self, frame):
+        names = []
+        while frame is not None and frame is not self.root:
+            names.append(frame_name(frame))
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(names))] += 1
+        self.samples += 1
+
+
+@lru_cache(maxsize=None)
+def short_filename(filename):
+    """Путь к модулю относительно проекта или sys.path."""
+    for prefix in sorted(
+        (settings.BASE_DIR, *sys.path), key=len, reverse=True,
+    ):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return (
+        f'{short_filename(code.co_filename)}:'
+        f'{code.co_firstlineno}:{code.co_name}'
+    )
+
+
+def _sample_forever():
+    while True:
+        time.sleep(settings.PROFILER_INTERVAL)
+        frames = sys._current_frames()
+        with _lock:
+            for thread_id, profile in _active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.add(frame)
+
+
+def start(root):
+    """Начинает снимать стеки текущего потока до кадра root."""
+    global _sampler
+    profile = RequestProfile(root)
+    with _lock:
+        if _sampler is None:
+            _sampler = threading.Thread(
+                target=_sample_forever, name='profiler', daemon=True,
+            )
+            _sampler.start()
+        _active[threading.get_ident()] = profile
+    return profile
+
+
+def stop():
+    with _lock:
+        return _active.pop(threading.get_ident(), None)
+
+
+def save(profile, **metadata):
+    """Записывает профиль в PROFILER_DIR и удаляет самые старые файлы
+    сверх PROFILER_MAX_FILES."""
+    directory = settings.PROFILER_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f'{time.time():.6f}-{uuid.uuid4().hex[:8]}.json'
+    data = {
+        **metadata,
+        'interval': settings.PROFILER_INTERVAL,
+        'samples': profile.samples,
+        'stacks': dict(profile.stacks),
+    }
+    path = os.path.join(directory, name)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(f'{path}.tmp', path)
+    names = sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.name.endswith('.json')
+    )
+    for old in names[:-settings.PROFILER_MAX_FILES]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except FileNotFoundError:
+            pass
+    return path
+
+
+def load(directory):
+    """Профили из каталога; поврежденные файлы пропускаются."""
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path, encoding='utf-8') as file:
+                yield json.load(file)
+        except (OSError, ValueError):
+            continue
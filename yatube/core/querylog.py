@@ -0,0 +1,204 @@
+import atexit
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+_lock = threading.Lock()
+
+STATS = {}
+
+_flushed = time.monotonic()
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """SQL без значений: литералы и параметры заменены на ?, списки
+    значений в IN и VALUES — на (...), пробелы схлопнуты."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class RequestQueries:
+    """Обертка execute, собирающая запросы к базе одного HTTP-запроса."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.statements = Counter()
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.durations[fingerprint(sql)].append(duration)
+            if not many:
+                self.statements[sql, repr(params)] += 1
+            if duration >= settings.QUERYLOG_SLOW_THRESHOLD:
+                self.slow.append((duration, sql, params))
+
+
+def _new_entry():
+    return {
+        'count': 0,
+        'time': 0.0,
+        'max': 0.0,
+        'samples': [],
+        'requests': 0,
+        'n_plus_one': 0,
+        'duplicates': 0,
+    }
+
+
+def record(view, queries):
+    """Добавляет запросы HTTP-запроса к статистике представления view.
+
+    Отпечаток, выполненный за запрос QUERYLOG_N_PLUS_ONE раз и больше,
+    отмечается как N+1; повторы того же SQL с теми же параметрами
+    считаются дубликатами.
+    """
+    for duration, sql, params in queries.slow:
+        logger.warning(
+            'Медленный запрос %.3f с в %s: %s; %r',
+            duration, view, sql, params,
+        )
+    duplicates = Counter()
+    for (sql, _), number in queries.statements.items():
+        if number > 1:
+            duplicates[fingerprint(sql)] += number - 1
+    limit = settings.QUERYLOG_RESERVOIR
+    with _lock:
+        for key, durations in queries.durations.items():
+            entry = STATS.setdefault((view, key), _new_entry())
+            entry['requests'] += 1
+            entry['duplicates'] += duplicates[key]
+            if len(durations) >= settings.QUERYLOG_N_PLUS_ONE:
+                entry['n_plus_one'] += 1
+            for duration in durations:
+                entry['count'] += 1
+                entry['time'] += duration
+                entry['max'] = max(entry['max'], duration)
+                # Равномерная выборка длительностей для перцентилей.
+                samples = entry['samples']
+                if len(samples) < limit:
+                    samples.append(duration)
+                else:
+                    index = random.randrange(entry['count'])
+                    if index < limit:
+                        samples[index] = duration
+        due = _flush_due()
+    if due:
+        flush()
+
+
+def _flush_due():
+    """Наступил ли срок записи журнала; вызывается под _lock, поэтому
+    срок сдвигает и запись начинает только один поток."""
+    global _flushed
+    now = time.monotonic()
+    if now - _flushed < settings.QUERYLOG_FLUSH_INTERVAL:
+        return False
+    _flushed = now
+    return True
+
+
+def flush():
+    """Записывает накопленную статистику процесса в новый файл каталога
+    QUERYLOG_DIR и обнуляет ее.
+
+    Каждый файл содержит прирост с прошлой записи, load складывает их.
+    Ошибка записи только логируется, статистика при этом возвращается
+    в STATS до следующей попытки.
+    """
+    with _lock:
+        stats = dict(STATS)
+        STATS.clear()
+    if not stats:
+        return
+    data = [
+        {'view': view, 'fingerprint': key, **entry}
+        for (view, key), entry in stats.items()
+    ]
+    directory = settings.QUERYLOG_DIR
+    try:
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(
+            suffix='.tmp', prefix=f'querylog-{os.getpid()}-', dir=directory,
+        )
+        with open(descriptor, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temp_path, temp_path[:-len('.tmp')] + '.json')
+    except OSError:
+        logger.exception('Не удалось записать журнал запросов в %s',
+                         directory)
+        with _lock:
+            for key, entry in stats.items():
+                total = STATS.setdefault(key, _new_entry())
+                _merge(total, entry)
+                del total['samples'][settings.QUERYLOG_RESERVOIR:]
+
+
+atexit.register(flush)
+
+
+def reset():
+    with _lock:
+        STATS.clear()
+
+
+def _merge(total, entry):
+    for field in ('count', 'time', 'requests', 'n_plus_one', 'duplicates'):
+        total[field] += entry[field]
+    total['max'] = max(total['max'], entry['max'])
+    total['samples'].extend(entry['samples'])
+
+
+def log_files(directory):
+    """Пути файлов журнала в каталоге."""
+    if not os.path.isdir(directory):
+        return []
+    return [
+        entry.path for entry in os.scandir(directory)
+        if entry.name.endswith('.json')
+    ]
+
+
+def load(paths):
+    """Статистика из файлов журнала, сложенная по представлению
+    и отпечатку.
+
+    Выборки длительностей файлов объединяются без весов, поэтому
+    перцентили по ним смещены к процессам и периодам с малой нагрузкой.
+    """
+    merged = {}
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as file:
+                rows = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for row in rows:
+            key = row.pop('view'), row.pop('fingerprint')
+            _merge(merged.setdefault(key, _new_entry()), row)
+    return merged
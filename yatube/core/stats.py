@@ -0,0 +1,3 @@
+def percentile(values, fraction):
+    """Значение по методу ближайшего ранга из отсортированного списка."""
+    return values[max(int(len(values) * fraction + 0.5) - 1, 0)]
@@ -1,6 +1,17 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
 from http import HTTPStatus
+from io import StringIO
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import metrics, profiler, querylog
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +22,218 @@ class ViewTestClass(TestCase):
     def test_404_use_correct_template(self):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class MetricsTests(TestCase):
+    """Тесты middleware метрик и страницы /metrics/."""
+
+    def setUp(self):
+        metrics.reset()
+        cache.clear()
+
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_sampled_request_has_server_timing(self):
+        """Сэмплированный запрос получает Server-Timing и подробные метрики."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, '
+            r'cache;desc="[^"]*page_misses=1[^"]*", total;dur=[\d.]+$',
+        )
+        output = self.client.get(reverse('metrics')).content.decode()
+        for line in (
+            'yatube_requests_total{view="posts:index",method="GET",'
+            'status="200"} 1',
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            'yatube_sampled_requests_total{view="posts:index"} 1',
+            'yatube_sampled_cache_events_total{view="posts:index",'
+            'event="page_misses"} 1',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, output.splitlines())
+        self.assertIn('yatube_page_cache_events_total{event="misses"}',
+                      output)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_request_is_only_counted(self):
+        """Без сэмплинга запрос попадает только в счетчики и гистограмму."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        output = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            output,
+        )
+        self.assertNotIn('yatube_sampled_requests_total{', output)
+
+    def test_metrics_hidden_from_other_addresses(self):
+        """Метрики недоступны с адресов не из METRICS_ALLOWED_IPS."""
+        response = self.client.get(reverse('metrics'),
+                                   REMOTE_ADDR='192.0.2.1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ProfilerTests(TestCase):
+    """Тесты профилировщика запросов и команды profile_report."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_slow_requests_saved_and_rotated(self):
+        """Медленные запросы сохраняются, старые профили удаляются."""
+        with self.settings(PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=0,
+                           PROFILER_SLOW_THRESHOLD=0,
+                           PROFILER_DIR=self.directory, PROFILER_MAX_FILES=2):
+            for _ in range(3):
+                self.client.get(reverse('posts:index'))
+        profiles = list(profiler.load(self.directory))
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0]['view'], 'posts:index')
+        self.assertEqual(profiles[0]['reason'], 'slow')
+
+    def test_fast_requests_not_saved(self):
+        """Быстрые запросы вне выборки не сохраняются."""
+        with self.settings(PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=0,
+                           PROFILER_SLOW_THRESHOLD=60,
+                           PROFILER_DIR=self.directory):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_profile_report(self):
+        """Сводка показывает функции по убыванию собственного времени."""
+        stacks = {
+            'views.py:1:get;db.py:1:execute': 3,
+            'views.py:1:get;template.py:1:render': 1,
+        }
+        for number in range(2):
+            with open(os.path.join(self.directory, f'{number}.json'), 'w',
+                      encoding='utf-8') as file:
+                json.dump({'view': 'posts:index', 'duration': 1.5,
+                           'stacks': stacks}, file)
+        out = StringIO()
+        call_command('profile_report', dir=self.directory, top=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('== posts:index: профилей 2, выборок 8', lines[0])
+        self.assertRegex(lines[2], r'75\.0%\s+75\.0%\s+db\.py:1:execute$')
+        self.assertRegex(lines[3], r'25\.0%\s+25\.0%\s+template\.py')
+
+
+class QueryLogTests(TestCase):
+    """Тесты журнала запросов и команды query_report."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        querylog.reset()
+        self.addCleanup(querylog.reset)
+        cache.clear()
+
+    @staticmethod
+    def run_queries(*statements):
+        queries = querylog.RequestQueries()
+        for sql, params in statements:
+            queries(lambda *args: None, sql, params, False, {})
+        return queries
+
+    def test_fingerprint(self):
+        """Отпечаток не зависит от значений и длины списков."""
+        self.assertEqual(
+            querylog.fingerprint(
+                "SELECT * FROM t WHERE id IN (%s, %s, %s) AND  name = 'x'"
+            ),
+            'SELECT * FROM t WHERE id IN (...) AND name = ?',
+        )
+        self.assertEqual(
+            querylog.fingerprint('SELECT * FROM t WHERE id = 10 LIMIT 21'),
+            querylog.fingerprint('SELECT * FROM t WHERE id = %s LIMIT 5'),
+        )
+
+    def test_n_plus_one_and_duplicates(self):
+        """Повтор отпечатка отмечается как N+1, повтор параметров —
+        как дубликат."""
+        sql = 'SELECT * FROM auth_user WHERE id = %s'
+        with self.settings(QUERYLOG_N_PLUS_ONE=3):
+            querylog.record('posts:index', self.run_queries(
+                (sql, (1,)), (sql, (2,)), (sql, (2,)),
+                ('SELECT * FROM posts_post', ()),
+            ))
+        entry = querylog.STATS['posts:index', querylog.fingerprint(sql)]
+        self.assertEqual(entry['count'], 3)
+        self.assertEqual(entry['n_plus_one'], 1)
+        self.assertEqual(entry['duplicates'], 1)
+        entry = querylog.STATS['posts:index', 'SELECT * FROM posts_post']
+        self.assertEqual(
+            (entry['count'], entry['n_plus_one'], entry['duplicates']),
+            (1, 0, 0),
+        )
+
+    def test_middleware_and_report(self):
+        """Запросы представления попадают в журнал и в сводку."""
+        with self.settings(QUERYLOG_SAMPLE_RATE=1,
+                           QUERYLOG_DIR=self.directory):
+            self.client.get(reverse('posts:index'))
+            querylog.flush()
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        out = StringIO()
+        call_command('query_report', dir=self.directory,
+                     view='posts:index', reset=True, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertGreater(len(lines), 1)
+        for line in lines[1:]:
+            self.assertIn(' posts:index: SELECT', line)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_flush_writes_increments(self):
+        """Каждая запись журнала — прирост с прошлой, сводка их складывает."""
+        sql = 'SELECT * FROM posts_post'
+        with self.settings(QUERYLOG_DIR=self.directory):
+            for _ in range(2):
+                querylog.record('posts:index', self.run_queries((sql, ())))
+                querylog.flush()
+            querylog.flush()
+        self.assertEqual(querylog.STATS, {})
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        paths = querylog.log_files(self.directory)
+        entry = querylog.load(paths)['posts:index', sql]
+        self.assertEqual((entry['count'], entry['requests']), (2, 2))
+
+    def test_concurrent_flush(self):
+        """Одновременные записи не мешают друг другу и не теряют данных."""
+        sql = 'SELECT * FROM posts_post'
+        errors = []
+
+        def work():
+            try:
+                for _ in range(20):
+                    querylog.record('posts:index', self.run_queries((sql, ())))
+                    querylog.flush()
+            except Exception as error:
+                errors.append(error)
+
+        with self.settings(QUERYLOG_DIR=self.directory):
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        merged = querylog.load(querylog.log_files(self.directory))
+        self.assertEqual(merged['posts:index', sql]['count'], 160)
+
+    def test_flush_error_keeps_stats(self):
+        """Ошибка записи журнала логируется, статистика сохраняется."""
+        sql = 'SELECT * FROM posts_post'
+        querylog.record('posts:index', self.run_queries((sql, ())))
+        path = os.path.join(self.directory, 'file')
+        open(path, 'w').close()
+        with self.settings(QUERYLOG_DIR=path), \
+                self.assertLogs('core.querylog', 'ERROR'):
+            querylog.flush()
+        self.assertEqual(querylog.STATS['posts:index', sql]['count'], 1)
+
+    def test_empty_report(self):
+        """Для пустого журнала таблица не выводится."""
+        out = StringIO()
+        call_command('query_report', dir=self.directory, stdout=out)
+        self.assertEqual(out.getvalue(), 'Журнал пуст.\n')
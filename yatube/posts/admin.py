@@ -1,18 +1,31 @@
 from django.contrib import admin
 
-from .models import Post, Group, Comment, Follow
+from .models import Post, Group, Comment, Follow, TextToken
+from .text_index import TextIndexSearchMixin
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(TextIndexSearchMixin, admin.ModelAdmin):
     """Свойства для администрирования постов."""
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
+    text_index_kind = TextToken.POST
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
 
+class CommentAdmin(TextIndexSearchMixin, admin.ModelAdmin):
+    """Свойства для администрирования комментариев."""
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('post',)
+    search_fields = ('text',)
+    text_index_kind = TextToken.COMMENT
+    list_filter = ('created',)
+    empty_value_display = '-пусто-'
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
-admin.site.register(Comment)
+admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow)
@@ -3,3 +3,21 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from core import metrics
+
+        from . import signals  # noqa: F401
+        from .cache import page_cache_stats
+        from .kvstore import kvstore_stats
+
+        metrics.register_collector(
+            'yatube_page_cache_events_total',
+            'События кеша страниц лент в процессе.',
+            page_cache_stats,
+        )
+        metrics.register_collector(
+            'yatube_thumbnail_kvstore_events_total',
+            'Обращения к хранилищу описаний миниатюр в процессе.',
+            kvstore_stats,
+        )
@@ -0,0 +1,45 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='posts',
+            )
+    return _executor
+
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s не выполнена', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def submit_on_commit(func, *args):
+    """Выполняет func(*args) в пуле фоновых потоков.
+
+    Задача отправляется после фиксации транзакции, чтобы поток увидел
+    сохраненные данные. При BACKGROUND_WORKERS = 0 она выполняется сразу
+    в текущем потоке.
+    """
+    if not settings.BACKGROUND_WORKERS:
+        func(*args)
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, args))
@@ -0,0 +1,31 @@
+import time
+
+from django.db import connection
+
+
+class QueryCounter:
+    """Обертка execute, считающая запросы к базе.
+
+    В отличие от connection.queries не зависит от DEBUG и не обрезается
+    на 9000 запросах.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure_request(client, path, data=None, method='get'):
+    """Выполняет запрос тестовым клиентом.
+
+    Возвращает ответ, время в миллисекундах и число запросов к базе.
+    """
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        response = getattr(client, method)(path, data or {})
+        elapsed = (time.perf_counter() - started) * 1000
+    return response, elapsed, counter.count
@@ -0,0 +1,252 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from http import HTTPStatus
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from core import metrics
+
+from .models import Group, Post, User
+
+
+def _generation_key(name):
+    return f'generation:{name}'
+
+
+def get_generations(names):
+    """Возвращает текущие поколения для имен одним запросом к кешу.
+
+    Отсутствующее в кеше поколение создается заново, поэтому ключи,
+    построенные на старом значении, больше не используются.
+    """
+    keys = [_generation_key(name) for name in names]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, uuid4().hex, None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(*names):
+    """Делает недействительными все ключи, построенные на поколениях."""
+    cache.set_many(
+        {_generation_key(name): uuid4().hex for name in names}, None,
+    )
+
+
+# Карточки постов в кеше строятся на поколениях поста, автора и группы,
+# страницы лент — на поколениях главной, группы и профиля.
+
+def feed_generations(group_ids=(), author_ids=()):
+    """Имена поколений лент групп и профилей авторов."""
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk is not None],
+    ).values_list('slug', flat=True)
+    usernames = User.objects.filter(
+        pk__in=author_ids,
+    ).values_list('username', flat=True)
+    return (
+        [f'feed:group:{slug}' for slug in slugs]
+        + [f'feed:profile:{username}' for username in usernames]
+    )
+
+
+def bump_post_generations(post, group_ids=()):
+    """Сбрасывает карточку поста и страницы лент, на которых он показан."""
+    bump_generation(
+        f'post:{post.pk}',
+        'feed:index',
+        *feed_generations({post.group_id, *group_ids}, [post.author_id]),
+    )
+
+
+def detail_generations(pk, author_id, username, group_id):
+    """Поколения подробной страницы поста.
+
+    Кроме поста, автора и группы, страница зависит от комментариев
+    и от числа постов автора, которое меняется вместе с лентой профиля.
+    """
+    names = [
+        f'post:{pk}',
+        f'comments:{pk}',
+        f'user:{author_id}',
+        f'feed:profile:{username}',
+    ]
+    if group_id is not None:
+        names.append(f'group:{group_id}')
+    return names
+
+
+def get_post_detail(pk):
+    """Пост с автором, профилем и группой из кеша или из базы.
+
+    Запись хранит имена и значения поколений, от которых зависит пост,
+    и используется, пока ни одно из них не изменилось. Поколения
+    читаются до запроса к базе: если пост изменится после чтения, запись
+    окажется недействительной. Возвращает None, если поста нет.
+    """
+    key = f'post_detail:{pk}'
+    entry = cache.get(key)
+    if entry is not None:
+        names = entry['names']
+    else:
+        # Имена поколений зависят от автора и группы поста; без записи
+        # они читаются легким запросом без профиля.
+        row = Post.objects.filter(pk=pk).values_list(
+            'author_id', 'author__username', 'group_id',
+        ).first()
+        if row is None:
+            return None
+        names = detail_generations(pk, *row)
+    generations = get_generations(names)
+    if entry is not None and generations == entry['generations']:
+        return entry['post']
+    for _ in range(2):
+        post = Post.objects.for_detail().filter(pk=pk).first()
+        if post is None:
+            return None
+        post_names = detail_generations(
+            post.pk, post.author_id, post.author.username, post.group_id,
+        )
+        if post_names == names:
+            cache.set(
+                key,
+                {'names': names, 'generations': generations, 'post': post},
+                settings.POST_DETAIL_CACHE_TIMEOUT,
+            )
+            break
+        # Автор или группа поста сменились с прошлого чтения: поколения
+        # новых имен читаются, и пост запрашивается еще раз.
+        names = post_names
+        generations = get_generations(names)
+    return post
+
+
+PAGE_CACHE_STATS = Counter()
+
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        PAGE_CACHE_STATS[event] += 1
+    metrics.count(f'page_{event}')
+
+
+def page_cache_stats():
+    """Счетчики кеша страниц в текущем процессе: hits, misses, stale."""
+    with _stats_lock:
+        return dict(PAGE_CACHE_STATS)
+
+
+def _path_hash(request):
+    return hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+
+def page_cache_key(name, request):
+    """Ключ страницы: имя ленты, пользователь и полный путь с query."""
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    return f'page:{name}:{user_id}:{_path_hash(request)}'
+
+
+def page_lock_key(name, request):
+    """Ключ блокировки пересборки: общий для всех пользователей."""
+    return f'page:{name}:lock:{_path_hash(request)}'
+
+
+def _is_fresh(entry, generation):
+    return (
+        entry is not None
+        and entry['generation'] == generation
+        and time.time() - entry['created'] < settings.FEED_CACHE_TIMEOUT
+    )
+
+
+def _wait_for_page(page_cache, key, lock_key, generation):
+    """Ждет, пока процесс, захвативший блокировку, отрисует страницу."""
+    deadline = time.monotonic() + settings.FEED_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(settings.FEED_CACHE_LOCK_POLL_INTERVAL)
+        entry = page_cache.get(key)
+        if _is_fresh(entry, generation):
+            return entry
+        if page_cache.get(lock_key) is None:
+            return None
+    return None
+
+
+def _render_page(page_cache, key, generation, response):
+    if callable(getattr(response, 'render', None)):
+        started = time.perf_counter()
+        response.render()
+        metrics.add_template_time(time.perf_counter() - started)
+    if response.status_code == HTTPStatus.OK and not response.streaming:
+        page_cache.set(
+            key,
+            {
+                'generation': generation,
+                'created': time.time(),
+                'response': response,
+            },
+            settings.FEED_CACHE_TIMEOUT + settings.FEED_CACHE_STALE_TIMEOUT,
+        )
+    return response
+
+
+def cache_feed_page(generation):
+    """Кеширует страницу ленты до изменения ее содержимого.
+
+    generation — шаблон имени поколения, заполняемый аргументами URL,
+    например 'feed:group:{slug}'. Поколение увеличивается сигналами при
+    изменении постов ленты, поэтому записи могут жить долго.
+
+    Страницы хранятся отдельно для каждого пользователя: в них есть
+    шапка и кнопки подписки. Блокировка пересборки общая для всех
+    пользователей: пока один запрос пересобирает страницу, остальные
+    получают свою предыдущую версию, а если ее нет — ждут окончания
+    пересборки и отрисовывают страницу уже по прогретому кешу карточек.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            name = generation.format(**kwargs)
+            current, = get_generations([name])
+            key = page_cache_key(name, request)
+            page_cache = caches['pages']
+            entry = page_cache.get(key)
+            if _is_fresh(entry, current):
+                _count('hits')
+                return entry['response']
+            lock_key = page_lock_key(name, request)
+            if page_cache.add(lock_key, True,
+                              settings.FEED_CACHE_LOCK_TIMEOUT):
+                _count('misses')
+                try:
+                    return _render_page(
+                        page_cache, key, current,
+                        view_func(request, *args, **kwargs),
+                    )
+                finally:
+                    page_cache.delete(lock_key)
+            if entry is not None:
+                _count('stale')
+                return entry['response']
+            entry = _wait_for_page(page_cache, key, lock_key, current)
+            if entry is not None:
+                _count('hits')
+                return entry['response']
+            _count('misses')
+            return _render_page(
+                page_cache, key, current,
+                view_func(request, *args, **kwargs),
+            )
+        return wrapper
+    return decorator
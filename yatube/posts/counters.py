@@ -0,0 +1,25 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно изменяет счетчик на delta через F()-выражение.
+
+    Счетчики не опускаются ниже нуля: расхождения исправляет recount.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field, outer_ref='pk'):
+    """Подзапрос с количеством объектов model, ссылающихся на OuterRef."""
+    counts = (
+        model.objects
+        .filter(**{field: OuterRef(outer_ref)})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
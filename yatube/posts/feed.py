@@ -0,0 +1,151 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .background import submit_on_commit
+from .models import FeedEntry, Follow, Post, PostQuerySet, Profile
+from .utils import bulk_create_in_batches
+
+ENTRY_ORDERING = ('-pub_date', '-post_id')
+
+ENTRY_FIELDS = ('pub_date', 'post_id') + tuple(
+    f'post__{field}' for field in PostQuerySet.FEED_FIELDS
+)
+
+
+def is_pull_author(author_id) -> bool:
+    """Посты авторов с большим числом подписчиков читаются при запросе."""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def _insert_entries(entries):
+    bulk_create_in_batches(
+        FeedEntry, entries, settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user_id', flat=True)
+    _insert_entries(
+        FeedEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет все посты автора в ленту подписчика."""
+    posts = Post.objects.filter(
+        author_id=author_id,
+    ).values_list('pk', 'pub_date')
+    _insert_entries(
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def _insert_follow_posts(condition, params):
+    """Раскладывает посты авторов по лентам подписчиков одним
+    INSERT ... SELECT; уже существующие записи пропускаются.
+
+    В condition доступны таблицы follow, post и profile (профиль автора).
+    """
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{FeedEntry._meta.db_table} (user_id, post_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.pub_date '
+            f'FROM {Follow._meta.db_table} AS follow '
+            f'JOIN {Post._meta.db_table} AS post '
+            f'ON post.author_id = follow.author_id '
+            f'JOIN {Profile._meta.db_table} AS profile '
+            f'ON profile.user_id = follow.author_id '
+            f'WHERE {condition} '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            params,
+        )
+        return cursor.rowcount
+
+
+def rebuild_feeds():
+    """Раскладывает посты авторов по лентам всех их подписчиков.
+
+    Нужна после массовой загрузки в обход сигналов.
+    """
+    return _insert_follow_posts(
+        'profile.followers_count <= %s', [settings.FEED_FANOUT_LIMIT],
+    )
+
+
+def backfill_author_feeds(author_id):
+    """Раскладывает посты автора по лентам всех его подписчиков, если
+    автор не стал снова популярным к моменту выполнения."""
+    return _insert_follow_posts(
+        'follow.author_id = %s AND profile.followers_count <= %s',
+        [author_id, settings.FEED_FANOUT_LIMIT],
+    )
+
+
+def add_follow(follow):
+    if not is_pull_author(follow.author_id):
+        backfill_feed(follow.user_id, follow.author_id)
+
+
+def remove_follow(follow):
+    FeedEntry.objects.filter(
+        user_id=follow.user_id,
+        post__author_id=follow.author_id,
+    ).delete()
+    became_push_author = Profile.objects.filter(
+        user_id=follow.author_id,
+        followers_count=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+    if became_push_author:
+        # Подписчиков FEED_FANOUT_LIMIT: их ленты заполняются в фоне,
+        # а не в запросе отписки.
+        submit_on_commit(backfill_author_feeds, follow.author_id)
+
+
+def follow_feed(user):
+    """Лента подписок пользователя.
+
+    Обычно это записи материализованной ленты: страница выбирается одним
+    диапазоном индекса (user, -pub_date, -post). Если пользователь подписан
+    на авторов с большим числом подписчиков, их посты добавляются при
+    чтении, и лента строится по постам.
+    """
+    pull_authors = list(Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+    if pull_authors:
+        entries = FeedEntry.objects.filter(user=user).values('post')
+        return Post.objects.for_feed().filter(
+            Q(pk__in=entries) | Q(author_id__in=pull_authors)
+        )
+    return FeedEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group',
+    ).only(*ENTRY_FIELDS).order_by(*ENTRY_ORDERING)
+
+
+def cursor_ordering(queryset):
+    """Поля ключа курсора для ленты подписок, построенной follow_feed."""
+    if queryset.model is FeedEntry:
+        return ENTRY_ORDERING
+    return None
+
+
+def feed_posts(objects):
+    """Посты страницы ленты, построенной по записям или по постам."""
+    return [
+        obj.post if isinstance(obj, FeedEntry) else obj for obj in objects
+    ]
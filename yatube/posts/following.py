@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_generations
+from .models import Follow
+
+
+def followed_author_ids(request):
+    """Id авторов, на которых подписан пользователь запроса.
+
+    Множество загружается одним запросом к базе и хранится в кеше под
+    поколением подписок пользователя, а внутри запроса запоминается
+    в request: проверка подписки на любое число авторов страницы
+    не обращается ни к базе, ни к кешу.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+    author_ids = getattr(request, '_followed_author_ids', None)
+    if author_ids is None:
+        generation, = get_generations([f'following:{user.pk}'])
+        key = f'following:{user.pk}:{generation}'
+        author_ids = cache.get(key)
+        if author_ids is None:
+            author_ids = frozenset(
+                Follow.objects.filter(user=user).values_list(
+                    'author_id', flat=True,
+                )
+            )
+            cache.set(key, author_ids, settings.FOLLOWING_CACHE_TIMEOUT)
+        request._followed_author_ids = author_ids
+    return author_ids
+
+
+def is_following(request, author) -> bool:
+    """Подписан ли пользователь запроса на автора (объект или id)."""
+    author_id = getattr(author, 'pk', author)
+    return author_id in followed_author_ids(request)
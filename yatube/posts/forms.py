@@ -1,6 +1,9 @@
+from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
-from .models import Post, Comment
+from .images import normalize_image
+from .models import Post, Comment, Group, User
 
 
 class PostForm(ModelForm):
@@ -10,6 +13,12 @@ class PostForm(ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+        return image
+
 
 class CommentForm(ModelForm):
     """Форма для создания/редактирования комментария."""
@@ -17,3 +26,21 @@ class CommentForm(ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    """Форма поиска по постам."""
+    q = forms.CharField(label='Запрос', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Группа',
+        to_field_name='slug',
+        required=False,
+    )
+    author = forms.ModelChoiceField(
+        User.objects.all(),
+        label='Автор',
+        to_field_name='username',
+        required=False,
+        widget=forms.TextInput,
+    )
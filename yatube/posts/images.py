@@ -0,0 +1,102 @@
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, в которых загрузка сохраняется как есть; остальные
+# перекодируются в JPEG или, при наличии прозрачности, в PNG.
+KEPT_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Форматы анимаций, которые сохраняются без изменений. Многокадровые
+# MPO (так снимки сохраняют многие телефоны) анимацией не считаются
+# и обрабатываются как JPEG по первому кадру.
+ANIMATED_FORMATS = ('GIF', 'PNG', 'WEBP')
+
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+}
+
+
+def _output_format(image):
+    if image.format in KEPT_FORMATS:
+        return image.format
+    if 'A' in image.getbands() or 'transparency' in image.info:
+        return 'PNG'
+    return 'JPEG'
+
+
+def _save_params(image, format_):
+    params = {'format': format_}
+    if format_ in ('JPEG', 'WEBP'):
+        params['quality'] = settings.POST_IMAGE_QUALITY
+    if format_ in ('JPEG', 'PNG'):
+        params['optimize'] = True
+    if 'icc_profile' in image.info:
+        params['icc_profile'] = image.info['icc_profile']
+    if format_ == 'GIF' and 'transparency' in image.info:
+        params['transparency'] = image.info['transparency']
+    return params
+
+
+def normalize_image(upload):
+    """Приводит загруженное изображение поста к размерам для хранения.
+
+    Размер проверяется по заголовку, до декодирования пикселей. Большая
+    сторона уменьшается до POST_IMAGE_MAX_DIMENSION (JPEG сразу
+    декодируется в уменьшенном масштабе), поворот из EXIF применяется,
+    метаданные, кроме цветового профиля, отбрасываются. Результат пишется
+    во временный файл, который остается в памяти только до
+    FILE_UPLOAD_MAX_MEMORY_SIZE. Анимированные изображения не меняются.
+    """
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Загрузите корректное изображение.', code='invalid_image',
+        )
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение слишком большое: %(width)s×%(height)s.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+    if (image.format in ANIMATED_FORMATS
+            and getattr(image, 'n_frames', 1) > 1):
+        upload.seek(0)
+        return upload
+
+    source_format = image.format
+    format_ = _output_format(image)
+    max_size = (settings.POST_IMAGE_MAX_DIMENSION,) * 2
+    try:
+        image.thumbnail(max_size, Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError):
+        raise ValidationError(
+            'Загрузите корректное изображение.', code='invalid_image',
+        )
+    if format_ == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+
+    output = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE,
+    )
+    image.save(output, **_save_params(image, format_))
+    size = output.tell()
+    output.seek(0)
+
+    name = upload.name
+    if format_ != source_format:
+        name = f'{os.path.splitext(name)[0]}.{EXTENSIONS[format_]}'
+    return UploadedFile(
+        output,
+        name=name,
+        content_type=Image.MIME[format_],
+        size=size,
+    )
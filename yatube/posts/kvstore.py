@@ -0,0 +1,88 @@
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics
+
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+KVSTORE_STATS = Counter()
+
+_stats_lock = threading.Lock()
+
+
+def _count(event, number=1):
+    with _stats_lock:
+        KVSTORE_STATS[event] += number
+    metrics.count(f'thumbnail_{event}', number)
+
+
+def kvstore_stats():
+    """Счетчики хранилища миниатюр в текущем процессе: hits, misses."""
+    with _stats_lock:
+        return dict(KVSTORE_STATS)
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище ключей sorl в общем кеше с записью в базу данных.
+
+    Записи читаются из кеша THUMBNAIL_CACHE без срока хранения, база
+    данных читается только при промахе и остается источником истины:
+    каждая запись сначала сохраняется в нее. get_many() получает
+    миниатюры целой страницы одним запросом к кешу и не более чем одним
+    запросом к базе.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.THUMBNAIL_CACHE]
+
+    def get_many(self, image_files):
+        """Миниатюры из хранилища в порядке image_files, None — нет."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        values = self.cache.get_many(keys)
+        _count('hits', len(values))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            _count('misses', len(missing))
+            stored = dict(
+                KVStoreModel.objects.filter(
+                    key__in=missing,
+                ).values_list('key', 'value')
+            )
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(fetched, None)
+            values.update(fetched)
+        return [
+            None if values[key] == EMPTY_VALUE
+            else deserialize_image_file(values[key])
+            for key in keys
+        ]
+
+    def _get_raw(self, key):
+        value = self.cache.get(key)
+        if value is not None:
+            _count('hits')
+        else:
+            _count('misses')
+            value = KVStoreModel.objects.filter(
+                key=key,
+            ).values_list('value', flat=True).first()
+            if value is None:
+                value = EMPTY_VALUE
+            self.cache.set(key, value, None)
+        if value == EMPTY_VALUE:
+            return None
+        return value
+
+    def _set_raw(self, key, value):
+        KVStoreModel.objects.update_or_create(
+            key=key, defaults={'value': value},
+        )
+        self.cache.set(key, value, None)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.text_index import apply_changes
+
+
+class Command(BaseCommand):
+    help = ('Применяет накопленные изменения текстов к индексу поиска '
+            'админки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Изменений в одной транзакции '
+                 '(по умолчанию TEXT_INDEX_BATCH_SIZE).',
+        )
+
+    def handle(self, *args, **options):
+        applied = apply_changes(options['batch_size'])
+        self.stdout.write(f'Применено изменений: {applied}.')
@@ -0,0 +1,113 @@
+import random
+import statistics
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.cache import bump_generation
+from posts.counters import change_counter
+from posts.models import Post, Profile, User
+from posts.search import BACKENDS, fts5_available, get_backend, tokenize
+
+
+class Command(BaseCommand):
+    help = ('Измеряет время поиска по постам. С --posts сначала создает '
+            'синтетические посты: запускайте на отдельной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=0,
+            help='Сколько синтетических постов создать, например 1000000.',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Число поисковых запросов на бэкенд.',
+        )
+        parser.add_argument(
+            '--backend',
+            action='append',
+            choices=sorted(BACKENDS),
+            help='Бэкенд для замера; можно указать несколько '
+                 '(по умолчанию все доступные).',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = self.vocabulary(rng)
+        if options['posts']:
+            self.seed_posts(options['posts'], vocabulary, rng)
+        names = options['backend'] or [
+            name for name in sorted(BACKENDS)
+            if name != 'fts5' or fts5_available()
+        ]
+        if 'fts5' in names and not fts5_available():
+            raise CommandError('В базе нет таблицы FTS5.')
+        queries = [
+            ' '.join(rng.choices(vocabulary[:2000], k=rng.randint(1, 2)))
+            for _ in range(options['queries'])
+        ]
+        for name in names:
+            self.bench(name, queries)
+
+    def bench(self, name, queries):
+        backend = get_backend(name)
+        started = time.perf_counter()
+        backend.rebuild()
+        self.stdout.write(
+            f'== {name}: индекс построен за '
+            f'{time.perf_counter() - started:.2f} с'
+        )
+        timings, found = [], 0
+        for query in queries:
+            started = time.perf_counter()
+            rows = backend.search(tokenize(query), limit=11)
+            timings.append((time.perf_counter() - started) * 1000)
+            found += bool(rows)
+        timings.sort()
+        self.stdout.write(
+            f'запросов: {len(timings)}, с результатами: {found}, '
+            f'p50: {statistics.median(timings):.2f} мс, '
+            f'p95: {timings[int(len(timings) * 0.95) - 1]:.2f} мс, '
+            f'max: {timings[-1]:.2f} мс'
+        )
+
+    @staticmethod
+    def vocabulary(rng):
+        letters = 'абвгдежзиклмнопрстуфхцчшэюя'
+        words = {
+            ''.join(rng.choices(letters, k=rng.randint(3, 9)))
+            for _ in range(30000)
+        }
+        return sorted(words)
+
+    @transaction.atomic
+    def seed_posts(self, number, vocabulary, rng):
+        author, _ = User.objects.get_or_create(username='search-bench')
+        # Частоты слов по закону Ципфа, как в обычном тексте.
+        weights = list(accumulate(
+            1 / rank for rank in range(1, len(vocabulary) + 1)
+        ))
+        batch_size = 5000
+        for start in range(0, number, batch_size):
+            Post.objects.bulk_create(
+                Post(
+                    author=author,
+                    text=' '.join(rng.choices(
+                        vocabulary, cum_weights=weights,
+                        k=rng.randint(5, 60),
+                    )),
+                )
+                for _ in range(min(batch_size, number - start))
+            )
+        change_counter(
+            Profile.objects.filter(user=author), 'posts_count', number,
+        )
+        bump_generation('feed:index', f'feed:profile:{author.username}')
+        self.stdout.write(f'Создано постов: {number}')
@@ -0,0 +1,166 @@
+import json
+import statistics
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.stats import percentile
+from posts.benchmark import measure_request
+from posts.models import Comment, Follow, Group, Post, Profile, User
+from posts.search import tokenize
+from posts.urls import app_name, urlpatterns
+
+# Представления, которые принимают только POST, и их данные.
+POST_DATA = {
+    'add_comment': {'text': 'Комментарий из бенчмарка'},
+}
+
+# Страницы, доступные без входа, замеряются и для анонима.
+PUBLIC = ('index', 'search', 'profile', 'group_list', 'post_detail')
+
+# Адрес не из INTERNAL_IPS, чтобы debug_toolbar не попадал в замеры.
+REMOTE_ADDR = '192.0.2.1'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку и число запросов к базе для каждого URL '
+            'приложения posts и выводит отчет в JSON. Запускайте на базе '
+            'из seed_bench: команда создает комментарии и подписки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Число запросов к каждому URL после первого.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для отчета (по умолчанию stdout).',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Прошлый отчет для сравнения p95 и числа запросов.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля.')
+        samples = self.samples()
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'requests': options['requests'],
+                'debug': settings.DEBUG,
+                'database': connection.vendor,
+                'counts': {
+                    model._meta.model_name: model.objects.count()
+                    for model in (User, Group, Post, Comment, Follow)
+                },
+            },
+            'results': {},
+        }
+        for pattern in urlpatterns:
+            name = f'{app_name}:{pattern.name}'
+            kwargs = {
+                key: samples[key] for key in pattern.pattern.converters
+            }
+            users = ['authenticated']
+            if pattern.name in PUBLIC:
+                users.append('anonymous')
+            report['results'][name] = {
+                user: self.measure(
+                    pattern.name, reverse(name, kwargs=kwargs),
+                    samples, user, options['requests'],
+                )
+                for user in users
+            }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+        if options['baseline']:
+            self.compare(options['baseline'], report)
+
+    def samples(self):
+        """Самые нагруженные объекты базы для аргументов URL."""
+        author = Profile.objects.select_related('user').order_by(
+            '-posts_count',
+        ).first()
+        reader = Profile.objects.select_related('user').order_by(
+            '-following_count',
+        ).first()
+        group = Group.objects.order_by('-posts_count').first()
+        post = Post.objects.select_related('author').order_by(
+            '-comments_count',
+        ).first()
+        if None in (author, reader, group, post):
+            raise CommandError('База пуста: сначала запустите seed_bench.')
+        terms = tokenize(post.text)
+        return {
+            'username': author.user.username,
+            'slug': group.slug,
+            'post_id': post.pk,
+            'reader': reader.user,
+            'post_author': post.author,
+            'query': terms[0] if terms else '',
+        }
+
+    def client(self, view, samples, user):
+        client = Client(REMOTE_ADDR=REMOTE_ADDR)
+        if user == 'authenticated':
+            # Редактировать пост может только его автор.
+            client.force_login(
+                samples['post_author'] if view == 'post_edit'
+                else samples['reader']
+            )
+        return client
+
+    def measure(self, view, path, samples, user, requests):
+        """Первый (холодный) запрос и перцентили остальных."""
+        client = self.client(view, samples, user)
+        method, data = 'get', {}
+        if view in POST_DATA:
+            method, data = 'post', POST_DATA[view]
+        elif view == 'search':
+            data = {'q': samples['query']}
+        timings, queries = [], []
+        for _ in range(requests + 1):
+            response, elapsed, count = measure_request(
+                client, path, data, method,
+            )
+            timings.append(elapsed)
+            queries.append(count)
+        cold_ms, cold_queries = timings.pop(0), queries.pop(0)
+        timings.sort()
+        return {
+            'path': path,
+            'status': response.status_code,
+            'cold_ms': round(cold_ms, 3),
+            'cold_queries': cold_queries,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'max_ms': round(timings[-1], 3),
+            'queries': max(queries),
+        }
+
+    def compare(self, path, report):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        for name, users in report['results'].items():
+            for user, result in users.items():
+                previous = baseline.get(name, {}).get(user)
+                if previous is None:
+                    continue
+                self.stderr.write(
+                    f'{name} ({user}): p95 {previous["p95_ms"]:.2f} → '
+                    f'{result["p95_ms"]:.2f} мс, запросов '
+                    f'{previous["queries"]} → {result["queries"]}'
+                )
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.feed import cursor_ordering, follow_feed
+from posts.models import Follow, Group, Post, User
+from posts.paginators import CursorPaginator
+
+
+class Command(BaseCommand):
+    help = 'Выводит планы выполнения (EXPLAIN) запросов страниц-лент.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            help='Автор для ленты профиля (по умолчанию первый найденный).',
+        )
+        parser.add_argument(
+            '--group',
+            help='Slug группы (по умолчанию первая найденная).',
+        )
+        parser.add_argument(
+            '--follower',
+            help='Пользователь для ленты подписок '
+                 '(по умолчанию первый подписчик).',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Выполнить запросы (EXPLAIN ANALYZE, не для SQLite).',
+        )
+
+    def handle(self, *args, **options):
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for name, queryset in self.get_feed_querysets(options).items():
+            if queryset is None:
+                self.stdout.write(f'== {name}: нет данных, пропущено\n')
+                continue
+            paginator = CursorPaginator(
+                queryset, settings.POSTS_PER_PAGE,
+                ordering=cursor_ordering(queryset),
+            )
+            page = paginator.object_list[:settings.POSTS_PER_PAGE]
+            self.stdout.write(f'== {name}')
+            self.stdout.write(str(page.query))
+            try:
+                self.stdout.write(page.explain(**explain_options))
+            except ValueError as e:
+                raise CommandError(f'EXPLAIN не поддерживается: {e}')
+            self.stdout.write('')
+
+    def get_feed_querysets(self, options):
+        feed = Post.objects.for_feed()
+        author = self._get_object(User, 'username', options['username'])
+        group = self._get_object(Group, 'slug', options['group'])
+        if options['follower']:
+            follower = self._get_object(
+                User, 'username', options['follower'],
+            )
+        else:
+            follow = Follow.objects.select_related('user').first()
+            follower = follow.user if follow else None
+        return {
+            'index': feed,
+            'group_list': feed.filter(group=group) if group else None,
+            'profile': feed.filter(author=author) if author else None,
+            'follow_index': follow_feed(follower) if follower else None,
+        }
+
+    @staticmethod
+    def _get_object(model, field, value):
+        if value is None:
+            return model.objects.first()
+        try:
+            return model.objects.get(**{field: value})
+        except model.DoesNotExist:
+            raise CommandError(
+                f'{model._meta.verbose_name} «{value}» не найден(а).'
+            )
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import export_lines, open_ndjson
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в NDJSON '
+            'для import_posts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл для записи; - для stdout, .gz — сжатие gzip.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать вывод gzip независимо от имени файла.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.perf_counter()
+        written = 0
+        with open_ndjson(path, 'w', options['gzip']) as stream:
+            for line in export_lines(options['chunk_size']):
+                stream.write(line)
+                stream.write('\n')
+                written += 1
+        elapsed = time.perf_counter() - started
+        # При выводе в stdout отчет не должен попасть в данные.
+        report = self.stderr if path == '-' else self.stdout
+        report.write(
+            f'Выгружено записей: {written} за {elapsed:.2f} с '
+            f'({written / max(elapsed, 1e-9):.0f} записей/с).'
+        )
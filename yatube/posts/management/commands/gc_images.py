@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Удаляет изображения постов, на которые не ссылается ни один '
+            'пост, вместе с их миниатюрами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Не удалять файлы моложе стольких секунд: они могут '
+                 'принадлежать еще не сохраненному посту.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести файлы, которые будут удалены.',
+        )
+
+    def handle(self, *args, **options):
+        referenced = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+        )
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        removed = 0
+        for name in self.walk('posts'):
+            if name in referenced:
+                continue
+            if default_storage.get_modified_time(name) > cutoff:
+                continue
+            if options['dry_run']:
+                self.stdout.write(name)
+            elif Post.objects.filter(image=name).exists():
+                # Файл загрузили заново, пока шел обход.
+                continue
+            else:
+                delete(name)
+            removed += 1
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(f'{action} файлов: {removed}.')
+
+    def walk(self, path):
+        if not default_storage.exists(path):
+            return
+        directories, files = default_storage.listdir(path)
+        for name in files:
+            yield f'{path}/{name}'
+        for directory in directories:
+            yield from self.walk(f'{path}/{directory}')
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from posts.cache import bump_generation, feed_generations
+from posts.feed import rebuild_feeds
+from posts.search import get_backend
+from posts.transfer import Loader, RecordError, open_ndjson
+
+
+class Command(BaseCommand):
+    help = ('Загружает NDJSON из export_posts пачками bulk_create и '
+            'пересобирает счетчики, ленты и индексы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл для чтения; - для stdin, .gz — сжатие gzip.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Читать сжатый gzip поток независимо от имени файла.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько записей вставлять одним bulk_create.',
+        )
+
+    def handle(self, *args, **options):
+        loader = Loader(options['batch_size'])
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                with open_ndjson(
+                    options['path'], 'r', options['gzip'],
+                ) as stream:
+                    loader.load(stream)
+                loaded = time.perf_counter()
+                self.report(loader.counts, loaded - started)
+                # bulk_create не вызывает сигналы: производные данные
+                # пересобираются целиком.
+                call_command('recount', stdout=self.stdout)
+                entries = rebuild_feeds()
+                self.stdout.write(f'Записей лент добавлено: {entries}.')
+        except RecordError as error:
+            raise CommandError(error)
+        except IntegrityError as error:
+            raise CommandError(f'Нарушена целостность данных: {error}')
+        get_backend().rebuild()
+        call_command('rebuild_text_index', stdout=self.stdout)
+        self.invalidate(loader, options['batch_size'])
+        self.stdout.write(
+            f'Производные данные пересобраны за '
+            f'{time.perf_counter() - loaded:.2f} с.'
+        )
+
+    def invalidate(self, loader, batch_size):
+        """Сбрасывает кеш лент, карточек постов с новыми комментариями
+        и подписок пользователей с новыми подписками."""
+        names = ['feed:index'] + [
+            f'post:{pk}'
+            for pk in loader.commented_post_ids - loader.post_ids
+        ] + [f'following:{pk}' for pk in loader.follower_ids]
+        group_ids = list(loader.group_ids.values())
+        user_ids = list(loader.changed_user_ids)
+        total = max(len(group_ids), len(user_ids))
+        for start in range(0, total, batch_size):
+            names += feed_generations(
+                group_ids[start:start + batch_size],
+                user_ids[start:start + batch_size],
+            )
+        for start in range(0, len(names), batch_size):
+            bump_generation(*names[start:start + batch_size])
+
+    def report(self, counts, elapsed):
+        for kind, count in sorted(counts.items()):
+            self.stdout.write(f'{kind}: {count}')
+        total = sum(counts.values())
+        self.stdout.write(
+            f'Загружено записей: {total} за {elapsed:.2f} с '
+            f'({total / max(elapsed, 1e-9):.0f} записей/с).'
+        )
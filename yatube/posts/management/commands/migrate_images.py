@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import delete
+
+from posts.cache import bump_post_generations
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переименовывает изображения постов по хешу содержимого '
+            'и объединяет одинаковые файлы.')
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True,
+        ).distinct().order_by()
+        migrated = missing = 0
+        for name in names.iterator():
+            if default_storage.is_hashed(name):
+                continue
+            if not default_storage.exists(name):
+                missing += 1
+                continue
+            with default_storage.open(name) as content:
+                new_name = default_storage.save(name, content)
+            posts = list(Post.objects.filter(image=name).only(
+                'author_id', 'group_id',
+            ))
+            Post.objects.filter(image=name).update(image=new_name)
+            for post in posts:
+                bump_post_generations(post)
+            delete(name)
+            migrated += 1
+        self.stdout.write(
+            f'Перенесено файлов: {migrated}, не найдено: {missing}.'
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import BACKENDS, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            choices=sorted(BACKENDS),
+            help='Бэкенд поиска (по умолчанию из SEARCH_BACKEND).',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend(options['backend'])
+        backend.rebuild()
+        self.stdout.write(
+            f'Индекс {type(backend).__name__} перестроен.'
+        )
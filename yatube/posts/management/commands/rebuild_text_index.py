@@ -0,0 +1,73 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.models import TextChange, TextToken
+from posts.text_index import MODELS, save_tokens, tokenize_rows
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает индекс поиска админки по текстам постов '
+            'и комментариев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы и отдавать процессу за раз.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов разбора текста; 0 — без пула.',
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        last_change = TextChange.objects.aggregate(last=Max('pk'))['last']
+        TextToken.objects.all().delete()
+        pool = None
+        if options['workers']:
+            pool = ProcessPoolExecutor(max_workers=options['workers'])
+        try:
+            for kind, model in MODELS.items():
+                indexed = self.index(
+                    kind, model, options['chunk_size'], pool,
+                    max(options['workers'], 1) * 2,
+                )
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: {indexed}'
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if last_change is not None:
+            TextChange.objects.filter(pk__lte=last_change).delete()
+
+    def index(self, kind, model, chunk_size, pool, window):
+        rows = model.objects.values_list('pk', 'text').order_by().iterator(
+            chunk_size=chunk_size,
+        )
+        chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+        indexed = 0
+        pending = deque()
+        for chunk in chunks:
+            if pool is None:
+                save_tokens(kind, tokenize_rows(chunk))
+            else:
+                # Не больше window пачек в работе, чтобы не читать
+                # всю таблицу в память раньше, чем пул ее разберет.
+                pending.append(pool.submit(tokenize_rows, chunk))
+                if len(pending) >= window:
+                    save_tokens(kind, pending.popleft().result())
+            indexed += len(chunk)
+        while pending:
+            save_tokens(kind, pending.popleft().result())
+        return indexed
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import count_subquery
+from posts.models import Comment, Follow, Group, Post, Profile, User
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счетчики постов, '
+            'комментариев и подписок.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        missing = User.objects.filter(profile__isnull=True)
+        created = Profile.objects.bulk_create(
+            Profile(user=user) for user in missing.only('pk')
+        )
+        profiles = Profile.objects.update(
+            posts_count=count_subquery(Post, 'author', 'user'),
+            followers_count=count_subquery(Follow, 'author', 'user'),
+            following_count=count_subquery(Follow, 'user', 'user'),
+        )
+        groups = Group.objects.update(
+            posts_count=count_subquery(Post, 'group'),
+        )
+        posts = Post.objects.update(
+            comments_count=count_subquery(Comment, 'post'),
+        )
+        self.stdout.write(
+            f'Создано профилей: {len(created)}. Пересчитано профилей: '
+            f'{profiles}, групп: {groups}, постов: {posts}.'
+        )
@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts.models import Comment, Post
+from posts.transfer import open_ndjson
+
+# Тексты собираются из ограниченного набора предложений: генерировать
+# каждый текст Faker целиком слишком долго для миллионов постов.
+SENTENCES = 5000
+
+PERIOD = timedelta(days=365)
+
+
+def zipf_weights(number):
+    """Накопленные веса закона Ципфа для random.choices."""
+    return list(accumulate(1 / rank for rank in range(1, number + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетических пользователей, группы, посты, '
+            'комментарии и подписки и загружает их через import_posts. '
+            'Запускайте на отдельной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--output',
+            help='Сохранить сгенерированный NDJSON (.gz — со сжатием), '
+                 'чтобы потом загрузить его командой import_posts.',
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        path = options['output']
+        if path is None:
+            descriptor, path = tempfile.mkstemp(suffix='.ndjson')
+            os.close(descriptor)
+        try:
+            with open_ndjson(path, 'w') as stream:
+                for record in self.records(options):
+                    stream.write(json.dumps(record, ensure_ascii=False))
+                    stream.write('\n')
+            call_command(
+                'import_posts', path,
+                batch_size=options['batch_size'],
+                stdout=self.stdout,
+            )
+        finally:
+            if options['output'] is None:
+                os.remove(path)
+
+    def records(self, options):
+        """Записи в формате export_posts.
+
+        Авторы постов, популярность авторов среди подписчиков и посты
+        для комментариев выбираются по закону Ципфа, поэтому в данных
+        есть и авторы с огромным числом подписчиков, и обсуждения
+        с тысячами комментариев.
+        """
+        rng, fake = self.rng, self.fake
+        now = timezone.now()
+        users = [
+            f'{fake.user_name()}_{number}'
+            for number in range(options['users'])
+        ]
+        # Плодовитость и популярность авторов не связаны: иначе
+        # самый читаемый автор писал бы и больше всех, и ленты
+        # подписок росли бы квадратично.
+        prolific_users = rng.sample(users, len(users))
+        popular_users = rng.sample(users, len(users))
+        user_weights = zipf_weights(len(users))
+        groups = [f'bench-{number}' for number in range(options['groups'])]
+        sentences = [fake.sentence() for _ in range(SENTENCES)]
+
+        for slug in groups:
+            yield {
+                'model': 'group',
+                'slug': slug,
+                'title': fake.catch_phrase()[:200],
+                'description': fake.paragraph(),
+            }
+
+        first_post = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        post_dates = []
+        for number in range(options['posts']):
+            pub_date = now - PERIOD * rng.random()
+            post_dates.append(pub_date)
+            group = None
+            if groups and rng.random() < 0.7:
+                group = rng.choice(groups)
+            yield {
+                'model': 'post',
+                'id': first_post + number,
+                'author': rng.choices(
+                    prolific_users, cum_weights=user_weights,
+                )[0],
+                'group': group,
+                'text': ' '.join(rng.choices(sentences, k=rng.randint(1, 8))),
+                'pub_date': pub_date.isoformat(),
+                'image': '',
+            }
+
+        if post_dates:
+            first_comment = (
+                Comment.objects.aggregate(last=Max('pk'))['last'] or 0
+            ) + 1
+            post_weights = zipf_weights(len(post_dates))
+            commented = rng.choices(
+                range(len(post_dates)), cum_weights=post_weights,
+                k=options['comments'],
+            )
+            for number, index in enumerate(commented):
+                created = post_dates[index] + (
+                    now - post_dates[index]
+                ) * rng.random()
+                yield {
+                    'model': 'comment',
+                    'id': first_comment + number,
+                    'post': first_post + index,
+                    'author': rng.choice(users),
+                    'text': rng.choice(sentences),
+                    'created': created.isoformat(),
+                }
+
+        for user in users:
+            count = rng.randint(0, 2 * options['follows'])
+            authors = set(rng.choices(
+                popular_users, cum_weights=user_weights, k=count,
+            ))
+            authors.discard(user)
+            for author in sorted(authors):
+                yield {'model': 'follow', 'user': user, 'author': author}
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails, ready_picture
+
+
+class Command(BaseCommand):
+    help = 'Создает варианты всех изображений постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Число потоков, создающих миниатюры.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'image', 'author_id', 'group_id',
+        ).order_by('pk')
+        missing = [
+            post for post in posts.iterator()
+            if ready_picture(post.image) is None
+        ]
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(self.warm_in_thread, missing))
+        else:
+            results = [self.warm(post) for post in missing]
+        created = sum(results)
+        self.stdout.write(
+            f'Подготовлено изображений: {created}, '
+            f'не удалось создать: {len(results) - created}.'
+        )
+
+    def warm(self, post):
+        try:
+            return generate_thumbnails(post) is not None
+        except Exception as e:
+            self.stderr.write(f'Пост {post.pk}: {e}')
+            return False
+
+    def warm_in_thread(self, post):
+        try:
+            return self.warm(post)
+        finally:
+            connections.close_all()
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:18
+
+from itertools import islice
+
+from django.db import migrations, models
+
+
+def log_existing_texts(apps, schema_editor):
+    # Индекс заполнится при применении изменений или командой
+    # rebuild_text_index.
+    TextChange = apps.get_model('posts', 'TextChange')
+    for kind, model in (('post', 'Post'), ('comment', 'Comment')):
+        pks = apps.get_model('posts', model).objects.values_list(
+            'pk', flat=True,
+        )
+        changes = (
+            TextChange(kind=kind, object_id=pk) for pk in pks.iterator()
+        )
+        # Пачками без batch_size, см. posts.utils.bulk_create_in_batches.
+        while True:
+            batch = list(islice(changes, 500))
+            if not batch:
+                break
+            TextChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=7, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор')),
+            ],
+            options={
+                'verbose_name': 'Изменение текста',
+                'verbose_name_plural': 'Изменения текста',
+            },
+        ),
+        migrations.CreateModel(
+            name='TextToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=7, verbose_name='Тип')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор')),
+            ],
+            options={
+                'verbose_name': 'Слово индекса',
+                'verbose_name_plural': 'Слова индекса',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='texttoken',
+            index=models.Index(fields=['kind', 'object_id'], name='text_token_object_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='texttoken',
+            constraint=models.UniqueConstraint(fields=('kind', 'term', 'object_id'), name='unique_text_token'),
+        ),
+        migrations.RunPython(log_existing_texts, migrations.RunPython.noop),
+    ]
@@ -5,7 +5,27 @@ from django.urls import reverse
 User = get_user_model()
 
 
-class Group(models.Model):
+class CounterFieldsMixin:
+    """Не перезаписывает счетчики при сохранении существующего объекта.
+
+    Счетчики изменяются только через F()-выражения в сигналах, поэтому
+    значение, прочитанное вместе с объектом, могло устареть.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not args and kwargs.get('update_fields') is None
+                and not self._state.adding and self.pk is not None):
+            skipped = set(self.counter_fields) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+                and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CounterFieldsMixin, models.Model):
     """Модель для сообществ."""
     title = models.CharField(
         'Название',
@@ -20,12 +40,49 @@ class Group(models.Model):
     description = models.TextField(
         'Описание',
     )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    """QuerySet с выборками постов для страниц-лент."""
+
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'image',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__slug',
+        'group__title',
+    )
+
+    def for_feed(self):
+        """Посты вместе с автором и группой одним запросом.
+
+        Подгружаются только поля, которые выводит карточка поста.
+        """
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+    def for_detail(self):
+        """Посты для подробной страницы одним запросом.
+
+        Число постов автора и комментариев к посту берется
+        из счетчиков профиля и поста, а не считается агрегатами.
+        """
+        return self.select_related('author__profile', 'group')
+
+
+class Post(CounterFieldsMixin, models.Model):
     """Модель для постов."""
     text = models.TextField(
         'Текст',
@@ -55,11 +112,27 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
+    counter_fields = ('comments_count',)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -95,6 +168,10 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -126,3 +203,120 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_following'),
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class Profile(CounterFieldsMixin, models.Model):
+    """Профиль пользователя со счетчиками постов и подписок."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('posts_count', 'followers_count', 'following_count')
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return self.user.get_username()
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class TextToken(models.Model):
+    """Слово текста поста или комментария в индексе поиска админки."""
+    POST = 'post'
+    COMMENT = 'comment'
+    KINDS = (
+        (POST, 'Пост'),
+        (COMMENT, 'Комментарий'),
+    )
+
+    kind = models.CharField('Тип', max_length=7, choices=KINDS)
+    term = models.CharField('Слово', max_length=64)
+    object_id = models.PositiveIntegerField('Идентификатор')
+
+    class Meta:
+        verbose_name = 'Слово индекса'
+        verbose_name_plural = 'Слова индекса'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'term', 'object_id'],
+                                    name='unique_text_token'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'object_id'],
+                         name='text_token_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}: {self.term}'
+
+
+class TextChange(models.Model):
+    """Изменение текста, еще не примененное к индексу поиска админки."""
+
+    kind = models.CharField('Тип', max_length=7, choices=TextToken.KINDS)
+    object_id = models.PositiveIntegerField('Идентификатор')
+
+    class Meta:
+        verbose_name = 'Изменение текста'
+        verbose_name_plural = 'Изменения текста'
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}'
@@ -0,0 +1,220 @@
+import base64
+import binascii
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Post
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        raise InvalidCursor('Курсорные страницы не нумеруются')
+
+    previous_page_number = next_page_number
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница выбирается запросом
+    по индексу, начиная с позиции, закодированной в курсоре.
+
+    Поля ключа задаются аргументом ordering (по умолчанию — по дате
+    публикации и id, от новых к старым) и должны быть атрибутами объектов
+    страницы. Порядок может быть и возрастающим, как у комментариев
+    к посту. Неупорядоченный queryset упорядочивается по ключу, а явный
+    порядок, отличный от ключа, считается ошибкой.
+    """
+    ordering = ('-pub_date', '-pk')
+
+    def __init__(self, object_list, per_page, ordering=None, **kwargs):
+        ordering = tuple(ordering or self.ordering)
+        if len(ordering) != 2:
+            raise ImproperlyConfigured(
+                f'Ключ курсора должен состоять из двух полей: {ordering}'
+            )
+        current = tuple(object_list.query.order_by)
+        if not current:
+            object_list = object_list.order_by(*ordering)
+        elif current != ordering:
+            raise ImproperlyConfigured(
+                f'Queryset упорядочен по {current}, а ключ курсора — '
+                f'{ordering}'
+            )
+        self.ordering = ordering
+        self.date_field, self.id_field = (
+            field.lstrip('-') for field in ordering
+        )
+        if ordering[0].startswith('-'):
+            self.forward, self.backward = 'lt', 'gt'
+        else:
+            self.forward, self.backward = 'gt', 'lt'
+        super().__init__(object_list, per_page, **kwargs)
+
+    def page(self, cursor):
+        """Возвращает страницу после (или до) позиции курсора."""
+        if not cursor:
+            return self._page_after(None)
+        reverse, pub_date, pk = self.decode_cursor(cursor)
+        if reverse:
+            return self._page_before(pub_date, pk)
+        return self._page_after((pub_date, pk))
+
+    def _page_after(self, position):
+        queryset = self.object_list
+        if position is not None:
+            queryset = queryset.filter(
+                *self._seek(*position, self.forward)
+            )
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=self._cursor_for(rows[-1]) if has_next else None,
+            previous_cursor=(
+                self._cursor_for(rows[0], reverse=True)
+                if position is not None and rows else None
+            ),
+        )
+
+    def _page_before(self, pub_date, pk):
+        queryset = self.object_list.filter(
+            *self._seek(pub_date, pk, self.backward)
+        ).reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=self._cursor_for(rows[-1]) if rows else None,
+            previous_cursor=(
+                self._cursor_for(rows[0], reverse=True)
+                if has_previous else None
+            ),
+        )
+
+    def _seek(self, pub_date, pk, lookup):
+        """Условия для одного вызова filter().
+
+        Нестрогое условие по дате позволяет начать просмотр индекса
+        сразу с позиции курсора, а не перебирать все предыдущие строки.
+        """
+        date, key = self.date_field, self.id_field
+        return (
+            Q(**{f'{date}__{lookup}e': pub_date}),
+            Q(**{f'{date}__{lookup}': pub_date})
+            | Q(**{date: pub_date, f'{key}__{lookup}': pk}),
+        )
+
+    def _cursor_for(self, obj, reverse=False):
+        raw = '{}|{}|{}'.format(
+            int(reverse),
+            getattr(obj, self.date_field).isoformat(),
+            getattr(obj, self.id_field),
+        )
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Разбирает курсор на (reverse, pub_date, pk)."""
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(cursor + padding).decode()
+            reverse, pub_date, pk = raw.split('|')
+            pub_date = parse_datetime(pub_date)
+            if pub_date is None or reverse not in ('0', '1'):
+                raise ValueError
+            return reverse == '1', pub_date, int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise InvalidCursor('Некорректный курсор')
+
+
+class SearchPaginator:
+    """Пагинатор результатов поиска по ключу (rank, id).
+
+    Курсор, как и у CursorPaginator, кодирует направление и позицию,
+    поэтому страница выбирается из индекса без OFFSET.
+    """
+
+    def __init__(self, backend, terms, per_page, **filters):
+        self.backend = backend
+        self.terms = terms
+        self.per_page = per_page
+        self.filters = filters
+
+    def page(self, cursor):
+        position, reverse = None, False
+        if cursor:
+            reverse, position = self.decode_cursor(cursor)
+        rows = []
+        if self.terms:
+            rows = self.backend.search(
+                self.terms, position, reverse, self.per_page + 1,
+                **self.filters,
+            )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows = rows[::-1]
+            next_cursor = self._cursor_for(rows[-1]) if rows else None
+            previous_cursor = (
+                self._cursor_for(rows[0], reverse=True) if has_more else None
+            )
+        else:
+            next_cursor = self._cursor_for(rows[-1]) if has_more else None
+            previous_cursor = (
+                self._cursor_for(rows[0], reverse=True)
+                if position is not None and rows else None
+            )
+        posts = Post.objects.for_feed().in_bulk(pk for _, pk in rows)
+        return CursorPage(
+            [posts[pk] for _, pk in rows if pk in posts],
+            self,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+        )
+
+    @staticmethod
+    def _cursor_for(row, reverse=False):
+        raw = '{}|{!r}|{}'.format(int(reverse), *row)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Разбирает курсор на (reverse, (rank, id))."""
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(cursor + padding).decode()
+            reverse, rank, pk = raw.split('|')
+            if reverse not in ('0', '1'):
+                raise ValueError
+            return reverse == '1', (float(rank), int(pk))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise InvalidCursor('Некорректный курсор')
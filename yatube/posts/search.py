@@ -0,0 +1,225 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Post
+
+TOKEN = re.compile(r'[^\W_]+')
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре."""
+    return TOKEN.findall(text.lower())
+
+
+def fts5_available():
+    return (
+        connection.vendor == 'sqlite'
+        and FTS_TABLE in connection.introspection.table_names()
+    )
+
+
+class FTS5Backend:
+    """Индекс в виртуальной таблице SQLite FTS5, rowid — id поста.
+
+    Ранг — значение bm25(): чем меньше, тем релевантнее.
+    """
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, text) '
+                f'VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id],
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}'
+            )
+
+    def search(self, terms, position=None, reverse=False, limit=None,
+               group_id=None, author_id=None):
+        """Пары (rank, id) постов со всеми словами terms.
+
+        Упорядочены по (rank, id), начиная после position
+        или, при reverse, в обратном порядке до position.
+        """
+        conditions, params = [f'{FTS_TABLE} MATCH %s'], [
+            ' '.join('"{}"'.format(term) for term in terms),
+        ]
+        join = ''
+        if group_id is not None or author_id is not None:
+            join = (f'JOIN {Post._meta.db_table} AS post '
+                    f'ON post.id = {FTS_TABLE}.rowid')
+        if group_id is not None:
+            conditions.append('post.group_id = %s')
+            params.append(group_id)
+        if author_id is not None:
+            conditions.append('post.author_id = %s')
+            params.append(author_id)
+        outer, outer_params = '', []
+        if position is not None:
+            lookup = '<' if reverse else '>'
+            outer = (f'WHERE rank {lookup} %s '
+                     f'OR (rank = %s AND id {lookup} %s)')
+            rank, pk = position
+            outer_params = [rank, rank, pk]
+        direction = 'DESC' if reverse else 'ASC'
+        sql = (
+            f'SELECT rank, id FROM ('
+            f'SELECT bm25({FTS_TABLE}) AS rank, {FTS_TABLE}.rowid AS id '
+            f'FROM {FTS_TABLE} {join} WHERE {" AND ".join(conditions)}'
+            f') {outer} ORDER BY rank {direction}, id {direction}'
+        )
+        if limit is not None:
+            sql += ' LIMIT %s'
+            outer_params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + outer_params)
+            return cursor.fetchall()
+
+
+class MemoryBackend:
+    """Инвертированный индекс в памяти процесса с ранжированием BM25.
+
+    Строится из базы при первом поиске и обновляется сигналами этого
+    же процесса, поэтому подходит для разработки и СУБД без FTS5.
+    Ранг — BM25 со знаком минус, как у FTS5.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = None
+        self._documents = {}
+
+    def index(self, post):
+        with self._lock:
+            if self._postings is None:
+                return
+            self._remove(post.pk)
+            self._add(post.pk, post.text, post.group_id, post.author_id)
+
+    def remove(self, post_id):
+        with self._lock:
+            if self._postings is not None:
+                self._remove(post_id)
+
+    def rebuild(self):
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+            posts = Post.objects.values_list(
+                'pk', 'text', 'group_id', 'author_id',
+            ).order_by()
+            for row in posts.iterator(chunk_size=2000):
+                self._add(*row)
+
+    def search(self, terms, position=None, reverse=False, limit=None,
+               group_id=None, author_id=None):
+        with self._lock:
+            if self._postings is None:
+                self.rebuild()
+            rows = self._rank(terms, group_id, author_id)
+        rows.sort(reverse=reverse)
+        if position is not None:
+            rows = [
+                row for row in rows
+                if (row < position if reverse else row > position)
+            ]
+        return rows[:limit]
+
+    def _rank(self, terms, group_id, author_id):
+        postings = [self._postings.get(term, {}) for term in set(terms)]
+        if not postings or not all(postings):
+            return []
+        postings.sort(key=len)
+        total = len(self._documents)
+        average = sum(
+            document[0] for document in self._documents.values()
+        ) / total
+        rows = []
+        for post_id in postings[0]:
+            length, post_group_id, post_author_id, _ = (
+                self._documents[post_id]
+            )
+            if group_id is not None and post_group_id != group_id:
+                continue
+            if author_id is not None and post_author_id != author_id:
+                continue
+            score = 0
+            for posting in postings:
+                frequency = posting.get(post_id)
+                if frequency is None:
+                    break
+                idf = math.log(
+                    (total - len(posting) + 0.5) / (len(posting) + 0.5) + 1
+                )
+                score += idf * frequency * (self.k1 + 1) / (
+                    frequency
+                    + self.k1 * (1 - self.b + self.b * length / average)
+                )
+            else:
+                rows.append((-score, post_id))
+        return rows
+
+    def _add(self, post_id, text, group_id, author_id):
+        terms = tokenize(text)
+        frequencies = Counter(terms)
+        for term, frequency in frequencies.items():
+            self._postings[term][post_id] = frequency
+        self._documents[post_id] = (
+            len(terms), group_id, author_id, tuple(frequencies),
+        )
+
+    def _remove(self, post_id):
+        document = self._documents.pop(post_id, None)
+        if document is None:
+            return
+        for term in document[3]:
+            posting = self._postings[term]
+            del posting[post_id]
+            if not posting:
+                del self._postings[term]
+
+
+BACKENDS = {
+    'fts5': FTS5Backend,
+    'memory': MemoryBackend,
+}
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """Поисковый бэкенд по имени или из настройки SEARCH_BACKEND.
+
+    При значении 'auto' используется FTS5, если таблица индекса есть
+    в базе, иначе индекс в памяти.
+    """
+    name = name or settings.SEARCH_BACKEND
+    if name not in _backends:
+        if name == 'auto':
+            _backends[name] = get_backend(
+                'fts5' if fts5_available() else 'memory'
+            )
+        else:
+            _backends[name] = BACKENDS[name]()
+    return _backends[name]
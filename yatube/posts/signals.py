@@ -0,0 +1,202 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import feed, search, text_index
+from .cache import (
+    bump_generation, bump_post_generations, feed_generations,
+)
+from .counters import change_counter
+from .models import Comment, Follow, Group, Post, Profile, TextToken, User
+
+
+def _profiles(user_id):
+    return Profile.objects.filter(user_id=user_id)
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw, **kwargs):
+    if instance.pk is None or raw:
+        return
+    instance._previous_group_id = Post.objects.filter(
+        pk=instance.pk,
+    ).values_list('group_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw, **kwargs):
+    if instance.pk is None or raw:
+        return
+    instance._previous_slug = Group.objects.filter(
+        pk=instance.pk,
+    ).values_list('slug', flat=True).first()
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw, update_fields=None, **kwargs):
+    if instance.pk is None or raw:
+        return
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    instance._previous_username = User.objects.filter(
+        pk=instance.pk,
+    ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        change_counter(_profiles(instance.author_id), 'posts_count', 1)
+        change_counter(
+            Group.objects.filter(pk=instance.group_id), 'posts_count', 1,
+        )
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        change_counter(
+            Group.objects.filter(pk=previous_group_id), 'posts_count', -1,
+        )
+        change_counter(
+            Group.objects.filter(pk=instance.group_id), 'posts_count', 1,
+        )
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_counter(_profiles(instance.author_id), 'posts_count', -1)
+    change_counter(
+        Group.objects.filter(pk=instance.group_id), 'posts_count', -1,
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(
+            Post.objects.filter(pk=instance.post_id), 'comments_count', 1,
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_counter(
+        Post.objects.filter(pk=instance.post_id), 'comments_count', -1,
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(_profiles(instance.author_id), 'followers_count', 1)
+        change_counter(_profiles(instance.user_id), 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change_counter(_profiles(instance.author_id), 'followers_count', -1)
+    change_counter(_profiles(instance.user_id), 'following_count', -1)
+
+
+# Лента подписок обновляется после счетчиков: от числа подписчиков
+# зависит, раскладываются ли посты автора по лентам.
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        feed.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        feed.add_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_feed(sender, instance, **kwargs):
+    feed.remove_follow(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def log_post_text(sender, instance, **kwargs):
+    text_index.log_change(TextToken.POST, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def log_comment_text(sender, instance, **kwargs):
+    text_index.log_change(TextToken.COMMENT, instance.pk)
+
+
+# Поколения кеша карточек и страниц лент.
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    bump_post_generations(
+        instance, [getattr(instance, '_previous_group_id', None)],
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    bump_generation(f'comments:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    author_ids = instance.posts.values_list('author_id', flat=True)
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    bump_generation(
+        f'group:{instance.pk}',
+        'feed:index',
+        *(f'feed:group:{slug}' for slug in slugs if slug is not None),
+        *feed_generations(author_ids=author_ids.distinct()),
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    group_ids = instance.posts.values_list('group_id', flat=True)
+    usernames = {
+        instance.username, getattr(instance, '_previous_username', None),
+    }
+    bump_generation(
+        f'user:{instance.pk}',
+        'feed:index',
+        *(f'feed:profile:{username}' for username in usernames
+          if username is not None),
+        *feed_generations(group_ids.distinct()),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    bump_generation(
+        f'following:{instance.user_id}',
+        *feed_generations(author_ids=[instance.author_id]),
+    )
@@ -0,0 +1,51 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, именующее изображения постов по содержимому.
+
+    Файлы каталогов hashed_dirs сохраняются под именем
+    <каталог>/ab/cd/<sha256>.<расширение>, поэтому одинаковые загрузки
+    указывают на один файл и одни и те же миниатюры. Остальные файлы,
+    например миниатюры sorl, сохраняются как обычно.
+
+    При повторной загрузке существующего файла обновляется время его
+    изменения, чтобы gc_images с --min-age не удалил файл, на который
+    вот-вот сошлется новый пост.
+    """
+    hashed_dirs = ('posts/',)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if name.startswith(self.hashed_dirs) and not self.is_hashed(name):
+            name = self.hashed_name(name, content)
+            if self.exists(name):
+                os.utime(self.path(name))
+                return name
+        return super().save(name, content, max_length)
+
+    def hashed_name(self, name, content):
+        """Имя файла по SHA-256 содержимого с сохранением расширения."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = next(
+            prefix for prefix in self.hashed_dirs if name.startswith(prefix)
+        )
+        extension = os.path.splitext(name)[1].lower()
+        return f'{directory}{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def is_hashed(self, name):
+        return any(
+            name.startswith(prefix)
+            and HASHED_NAME.match(name[len(prefix):])
+            for prefix in self.hashed_dirs
+        )
@@ -0,0 +1,19 @@
+from django import template
+
+from .. import following
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, author):
+    """Подписан ли текущий пользователь на автора.
+
+    Подписки загружаются один раз за запрос, поэтому тег можно вызывать
+    для каждого автора в списке. В отрисованных карточках постов тег
+    не используется: карточки общие для всех пользователей.
+    """
+    request = context.get('request')
+    if request is None:
+        return False
+    return following.is_following(request, author)
@@ -0,0 +1,56 @@
+from django import template
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import metrics
+
+from ..cache import get_generations
+from ..thumbnails import prefetch_pictures
+
+register = template.Library()
+
+
+def card_generations(post):
+    names = [f'post:{post.pk}', f'user:{post.author_id}']
+    if post.group_id is not None:
+        names.append(f'group:{post.group_id}')
+    return names
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Отрисованные карточки постов с кешированием каждой карточки.
+
+    Ключ карточки содержит поколения поста, автора и группы, поэтому
+    изменение любого из них сразу приводит к новой отрисовке.
+    """
+    posts = list(posts)
+    names = [card_generations(post) for post in posts]
+    generations = iter(get_generations(
+        [name for post_names in names for name in post_names]
+    ))
+    keys = [
+        'post_card:{}:{}'.format(
+            post.pk,
+            ':'.join(next(generations) for _ in post_names),
+        )
+        for post, post_names in zip(posts, names)
+    ]
+    card_cache = caches['fragments']
+    cards = card_cache.get_many(keys)
+    missing = {
+        key: post for post, key in zip(posts, keys) if key not in cards
+    }
+    metrics.count('card_hits', len(cards))
+    metrics.count('card_misses', len(missing))
+    prefetch_pictures(missing.values())
+    for key, post in missing.items():
+        missing[key] = render_to_string(
+            'includes/post.html', {'post': post},
+        )
+    if missing:
+        card_cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,23 @@
+from django import template
+
+from ..thumbnails import ready_picture, schedule_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(post):
+    """Готовые варианты изображения поста или None.
+
+    Миниатюры не создаются во время запроса: если их еще нет, создание
+    ставится в очередь, а шаблон показывает заглушку.
+    """
+    if not post.image:
+        return None
+    if hasattr(post, 'prefetched_picture'):
+        picture = post.prefetched_picture
+    else:
+        picture = ready_picture(post.image)
+    if picture is None:
+        schedule_thumbnails(post)
+    return picture
@@ -0,0 +1,345 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import (
+    Comment, FeedEntry, Follow, Group, Post, Profile, TextChange, TextToken,
+)
+from ..thumbnails import ready_picture
+from ..urls import urlpatterns
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+class ExplainFeedsCommandTests(TestCase):
+    """Тест команды explain_feeds."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.follower = User.objects.create_user(username='TestFollower')
+        cls.group = Group.objects.create(
+            title='TestTitle',
+            slug='test_slug',
+            description='TestDescription',
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        Post.objects.create(text='TestText', author=cls.author,
+                            group=cls.group)
+
+    def test_explain_every_feed(self):
+        """План выводится для каждой ленты."""
+        out = StringIO()
+        call_command(
+            'explain_feeds',
+            username=self.author.username,
+            group=self.group.slug,
+            follower=self.follower.username,
+            stdout=out,
+        )
+        for feed in ('index', 'group_list', 'profile', 'follow_index'):
+            with self.subTest(feed=feed):
+                self.assertIn(f'== {feed}\n', out.getvalue())
+
+
+class RecountCommandTests(TestCase):
+    """Тест команды recount."""
+
+    def test_recount_repairs_drift(self):
+        """Команда восстанавливает счетчики и недостающие профили."""
+        author = User.objects.create_user(username='TestAuthor')
+        Post.objects.create(text='TestText', author=author)
+        Profile.objects.filter(user=author).update(posts_count=10)
+        User.objects.bulk_create([User(username='NoProfile')])
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(Profile.objects.get(user=author).posts_count, 1)
+        self.assertTrue(
+            Profile.objects.filter(user__username='NoProfile').exists()
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WarmThumbnailsCommandTests(TestCase):
+    """Тест команды warm_thumbnails."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_missing_thumbnails(self):
+        """Команда создает недостающие варианты изображений."""
+        post = Post.objects.create(
+            text='TestText',
+            author=User.objects.create_user(username='TestAuthor'),
+            image=SimpleUploadedFile(
+                name='TestImage.gif',
+                content=(
+                    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                    b'\x0A\x00\x3B'
+                ),
+                content_type='image/gif',
+            ),
+        )
+        self.assertIsNone(ready_picture(post.image))
+        out = StringIO()
+        call_command('warm_thumbnails', stdout=out)
+        self.assertIn('Подготовлено изображений: 1', out.getvalue())
+        self.assertIsNotNone(ready_picture(post.image))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageStorageCommandsTests(TestCase):
+    """Тест команд migrate_images и gc_images."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_migrate_images(self):
+        """Старые файлы переименовываются по хешу и объединяются."""
+        plain_storage = FileSystemStorage()
+        for name in ('posts/first.gif', 'posts/second.gif'):
+            plain_storage.save(name, ContentFile(b'TestContent'))
+            Post.objects.create(text=name, author=self.author, image=name)
+        call_command('migrate_images', stdout=StringIO())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name, = names
+        self.assertTrue(default_storage.is_hashed(name))
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(default_storage.exists('posts/first.gif'))
+
+    def test_gc_images(self):
+        """Удаляются только файлы, на которые не ссылаются посты."""
+        used = default_storage.save('posts/used.gif', ContentFile(b'Used'))
+        orphan = default_storage.save(
+            'posts/orphan.gif', ContentFile(b'Orphan'),
+        )
+        Post.objects.create(text='TestText', author=self.author, image=used)
+        call_command('gc_images', min_age=0, stdout=StringIO())
+        self.assertTrue(default_storage.exists(used))
+        self.assertFalse(default_storage.exists(orphan))
+
+    def test_reuploaded_orphan_kept(self):
+        """Повторная загрузка старого файла защищает его от gc_images."""
+        orphan = default_storage.save(
+            'posts/orphan.gif', ContentFile(b'Reused'),
+        )
+        os.utime(default_storage.path(orphan), (0, 0))
+        name = default_storage.save(
+            'posts/again.gif', ContentFile(b'Reused'),
+        )
+        self.assertEqual(name, orphan)
+        call_command('gc_images', stdout=StringIO())
+        self.assertTrue(default_storage.exists(orphan))
+
+
+class TextIndexCommandsTests(TestCase):
+    """Тест индекса поиска админки и команд rebuild_text_index,
+    apply_text_index."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='TestAdmin', email='admin@example.com', password='pass',
+        )
+        cls.post = Post.objects.create(
+            text='Рыжий кот', author=cls.admin,
+        )
+        cls.other_post = Post.objects.create(
+            text='Рыжая собака', author=cls.admin,
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.admin, text='Хороший кот',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_rebuild_text_index(self):
+        """Индекс строится заново и журнал изменений очищается."""
+        for workers in (0, 2):
+            with self.subTest(workers=workers):
+                call_command(
+                    'rebuild_text_index', workers=workers, chunk_size=1,
+                    stdout=StringIO(),
+                )
+                self.assertFalse(TextChange.objects.exists())
+                self.assertEqual(
+                    set(TextToken.objects.values_list(
+                        'kind', 'term', 'object_id',
+                    )),
+                    {
+                        (TextToken.POST, 'рыжий', self.post.pk),
+                        (TextToken.POST, 'кот', self.post.pk),
+                        (TextToken.POST, 'рыжая', self.other_post.pk),
+                        (TextToken.POST, 'собака', self.other_post.pk),
+                        (TextToken.COMMENT, 'хороший', self.comment.pk),
+                        (TextToken.COMMENT, 'кот', self.comment.pk),
+                    },
+                )
+
+    def test_changes_applied_incrementally(self):
+        """Изменения текстов попадают в индекс при применении журнала."""
+        post = Post.objects.create(text='Белый кот', author=self.admin)
+        deleted = Post.objects.create(text='Белая мышь', author=self.admin)
+        call_command('apply_text_index', stdout=StringIO())
+        post.text = 'Черный кот'
+        post.save()
+        deleted.delete()
+        call_command('apply_text_index', batch_size=1, stdout=StringIO())
+        self.assertFalse(TextChange.objects.exists())
+        self.assertEqual(
+            set(TextToken.objects.filter(
+                kind=TextToken.POST, term__in=('белый', 'белая', 'черный'),
+            ).values_list('term', 'object_id')),
+            {('черный', post.pk)},
+        )
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит объекты по всем словам запроса."""
+        urls = {
+            'admin:posts_post_changelist': ('Кот рыжий', self.post),
+            'admin:posts_comment_changelist': ('кот', self.comment),
+        }
+        for name, (query, obj) in urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name), {'q': query})
+                self.assertEqual(
+                    list(response.context['cl'].result_list), [obj],
+                )
+
+
+class TransferCommandsTests(TestCase):
+    """Тесты команд export_posts и import_posts."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='TestAuthor')
+        self.follower = User.objects.create_user(username='TestFollower')
+        self.group = Group.objects.create(
+            title='TestTitle',
+            slug='test_slug',
+            description='TestDescription',
+        )
+        self.post = Post.objects.create(
+            text='Рыжий кот', author=self.author, group=self.group,
+        )
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Хороший кот',
+        )
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def export(self, name):
+        path = os.path.join(self.directory, name)
+        call_command('export_posts', path, stdout=StringIO())
+        return path
+
+    def test_round_trip(self):
+        """Выгруженные данные загружаются обратно без потерь."""
+        path = self.export('posts.ndjson.gz')
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(2), b'\x1f\x8b')
+        pub_date = self.post.pub_date
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+        self.follower.delete()
+        call_command('import_posts', path, batch_size=1, stdout=StringIO())
+        with open(self.export('again.ndjson.gz'), 'rb') as again:
+            with open(path, 'rb') as original:
+                self.assertEqual(
+                    gzip.decompress(again.read()),
+                    gzip.decompress(original.read()),
+                )
+        post = Post.objects.get()
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.group.posts_count, 1)
+        follower = User.objects.get(username='TestFollower')
+        self.assertFalse(follower.has_usable_password())
+        self.assertEqual(follower.profile.following_count, 1)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=follower, post=post).exists()
+        )
+        self.assertTrue(
+            TextToken.objects.filter(term='рыжий', object_id=post.pk).exists()
+        )
+
+    def test_invalid_record_rolls_back(self):
+        """Ошибка в записи отменяет всю загрузку."""
+        path = os.path.join(self.directory, 'broken.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('{"model": "group", "slug": "new", "title": "T", '
+                       '"description": ""}\n')
+            file.write('{"model": "post", "id": 1000}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_posts', path, stdout=StringIO())
+        self.assertFalse(Group.objects.filter(slug='new').exists())
+
+
+class BenchCommandsTests(TestCase):
+    """Тесты команд seed_bench и bench_views."""
+
+    def test_seed_and_bench(self):
+        """Данные создаются, а отчет покрывает каждый URL приложения."""
+        call_command(
+            'seed_bench', users=20, groups=3, posts=50, comments=100,
+            follows=3, stdout=StringIO(),
+        )
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            Profile.objects.get(
+                user=Post.objects.first().author,
+            ).posts_count,
+            Post.objects.filter(author=Post.objects.first().author).count(),
+        )
+        out = StringIO()
+        call_command('bench_views', requests=2, stdout=out)
+        results = json.loads(out.getvalue())['results']
+        self.assertEqual(
+            set(results),
+            {f'posts:{pattern.name}' for pattern in urlpatterns},
+        )
+        for name, users in results.items():
+            for user, result in users.items():
+                with self.subTest(name=name, user=user):
+                    self.assertLess(result['status'], 400)
+                    self.assertGreaterEqual(
+                        result['p95_ms'], result['p50_ms'],
+                    )
@@ -1,12 +1,17 @@
+import os
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from ..forms import PostForm
 from ..models import Post, Group
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -69,12 +74,38 @@ class PostFormTests(TestCase):
                 kwargs={'username': self.user.get_username()}
             ),
         )
-        self.assertTrue(
-            Post.objects.filter(
-                text=form_data['text'],
-                group=form_data['group'],
-                image=f"posts/{form_data['image'].name}"
-            ).exists()
+        post = Post.objects.get(
+            text=form_data['text'],
+            group=form_data['group'],
+        )
+        self.assertRegex(
+            post.image.name,
+            r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$',
+        )
+
+    def test_identical_images_stored_once(self):
+        """Одинаковые изображения хранятся в одном файле."""
+        for text in ('FirstPost', 'SecondPost'):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': text,
+                    'image': SimpleUploadedFile(
+                        name=f'{text}.gif',
+                        content=self.raw_image,
+                        content_type='image/gif',
+                    ),
+                },
+            )
+        first, second = Post.objects.filter(
+            text__in=('FirstPost', 'SecondPost'),
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            len(default_storage.listdir(
+                os.path.dirname(first.image.name)
+            )[1]),
+            1,
         )
 
     def test_edit_post_form(self):
@@ -111,6 +142,89 @@ class PostFormTests(TestCase):
         )
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_DIMENSION=100)
+class PostImageNormalizationTests(TestCase):
+    """Тестирование обработки загруженных изображений в PostForm."""
+
+    def test_large_image_downscaled(self):
+        """Большая сторона изображения уменьшается до допустимой."""
+        image = self._clean_image(self._upload((400, 200), 'PNG', 'a.png'))
+        self.assertEqual(Image.open(image).size, (100, 50))
+        self.assertEqual(image.name, 'a.png')
+
+    def test_exif_orientation_applied_and_stripped(self):
+        """Поворот из EXIF применяется, метаданные удаляются."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        image = self._clean_image(
+            self._upload((40, 20), 'JPEG', 'a.jpg', exif=exif.tobytes()),
+        )
+        stored = Image.open(image)
+        self.assertEqual(stored.size, (20, 40))
+        self.assertNotIn('exif', stored.info)
+
+    def test_mpo_photo_normalized_as_jpeg(self):
+        """Снимок MPO уменьшается, поворачивается и лишается EXIF."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'SecretCam'
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), color=(255, 0, 0)).save(
+            buffer, 'MPO', save_all=True, exif=exif.tobytes(),
+            append_images=[Image.new('RGB', (400, 200))],
+        )
+        image = self._clean_image(
+            SimpleUploadedFile('a.jpg', buffer.getvalue()),
+        )
+        stored = Image.open(image)
+        self.assertEqual(stored.format, 'JPEG')
+        self.assertEqual(stored.size, (50, 100))
+        self.assertNotIn('exif', stored.info)
+        self.assertGreater(stored.getpixel((25, 50))[0], 200)
+
+    def test_animation_kept(self):
+        """Анимированный GIF сохраняется без изменений."""
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200)).save(
+            buffer, 'GIF', save_all=True,
+            append_images=[Image.new('RGB', (400, 200), color=(255, 0, 0))],
+        )
+        upload = SimpleUploadedFile('a.gif', buffer.getvalue())
+        image = self._clean_image(upload)
+        image.seek(0)
+        self.assertEqual(image.read(), buffer.getvalue())
+
+    def test_other_formats_converted(self):
+        """Изображения прочих форматов сохраняются в JPEG."""
+        image = self._clean_image(self._upload((40, 20), 'BMP', 'a.bmp'))
+        self.assertEqual(Image.open(image).format, 'JPEG')
+        self.assertEqual(image.name, 'a.jpg')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Изображение с чрезмерным числом пикселей отклоняется."""
+        form = PostForm(
+            data={'text': 'TestText'},
+            files={'image': self._upload((40, 20), 'PNG', 'a.png')},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'image_too_large')
+
+    def _clean_image(self, upload):
+        form = PostForm(data={'text': 'TestText'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.cleaned_data['image']
+
+    @staticmethod
+    def _upload(size, format_, name, **params):
+        buffer = BytesIO()
+        Image.new('RGB', size, color=(255, 0, 0)).save(
+            buffer, format_, **params,
+        )
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+
 class CommentFormTest(TestCase):
     """Тестирование формы CommentForm."""
 
@@ -4,7 +4,7 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Post, Group
+from ..models import Comment, Follow, Group, Post, Profile
 
 User = get_user_model()
 
@@ -153,3 +153,55 @@ class GroupModelTests(TestCase):
             (f'Значение "unique" для поля "{field}" '
              f'должно быть равно "{expected_value}".')
         )
+
+
+class CountersTests(TestCase):
+    """Тестирование денормализованных счетчиков."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='TestTitle',
+            slug='test_slug',
+            description='TestDescription',
+        )
+
+    def test_post_counters(self):
+        """Счетчики постов автора и группы следуют за постами."""
+        post = Post.objects.create(
+            text='TestText', author=self.author, group=self.group,
+        )
+        self.assertEqual(self._profile(self.author).posts_count, 1)
+        self.assertEqual(self._group().posts_count, 1)
+        post.group = None
+        post.save()
+        self.assertEqual(self._group().posts_count, 0)
+        post.delete()
+        self.assertEqual(self._profile(self.author).posts_count, 0)
+
+    def test_comment_counter_survives_post_save(self):
+        """Сохранение поста не затирает счетчик комментариев."""
+        post = Post.objects.create(text='TestText', author=self.author)
+        Comment.objects.create(post=post, author=self.user, text='Text')
+        post.text = 'NewText'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_follow_counters(self):
+        """Счетчики подписчиков и подписок следуют за подписками."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self._profile(self.author).followers_count, 1)
+        self.assertEqual(self._profile(self.user).following_count, 1)
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(self._profile(self.author).followers_count, 0)
+        self.assertEqual(self._profile(self.user).following_count, 0)
+
+    def _profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def _group(self):
+        return Group.objects.get(pk=self.group.pk)
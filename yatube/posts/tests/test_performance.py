@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..benchmark import measure_request
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Размеры данных: число постов автора, комментариев к посту и авторов
+# в подписках читателя.
+SIZES = (1, settings.POSTS_PER_PAGE, 3 * settings.POSTS_PER_PAGE)
+
+# Наибольшее число запросов к базе: (без кеша, с кешем).
+QUERY_BUDGETS = {
+    'index': (4, 1),
+    'group_list': (5, 1),
+    'profile': (6, 1),
+    'post_detail': (5, 3),
+    'follow_index': (5, 5),
+    'profile_follow': (13, 13),
+    'profile_unfollow': (10, 10),
+}
+
+# Ссылки подписки изменяют данные и сразу перенаправляют: их кеш
+# не проверяется.
+REDIRECTS = ('profile_follow', 'profile_unfollow')
+
+# Предел времени ответа с запасом для медленных машин CI: ловит
+# квадратичные алгоритмы, а не колебания в миллисекунды.
+TIME_BUDGET_MS = 500
+
+
+class PerformanceBudgetMixin:
+    """Проверки числа запросов и времени ответа страницы."""
+
+    def clear_caches(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def assertWithinBudget(self, client, view, path):
+        """Запрос в пределах бюджета без кеша и с кешем.
+
+        Возвращает число запросов без кеша.
+        """
+        self.clear_caches()
+        cold_queries, warm_queries = QUERY_BUDGETS[view]
+        _, elapsed, queries = measure_request(client, path)
+        self.assertLessEqual(queries, cold_queries, f'{view}: запросы')
+        self.assertLess(elapsed, TIME_BUDGET_MS, f'{view}: время')
+        if view not in REDIRECTS:
+            _, elapsed, warm = measure_request(client, path)
+            self.assertLessEqual(warm, warm_queries, f'{view}: с кешем')
+            self.assertLess(elapsed, TIME_BUDGET_MS, f'{view}: время')
+        return queries
+
+
+class ViewBudgetsTests(PerformanceBudgetMixin, TestCase):
+    """Регрессионные тесты запросов и времени ответа страниц posts."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.fan = User.objects.create_user(username='TestFan')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='TestTitle',
+            slug='test_slug',
+            description='TestDescription',
+        )
+        cls.post = Post.objects.create(
+            text='TestText', author=cls.author, group=cls.group,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.fan_client = Client()
+        self.fan_client.force_login(self.fan)
+
+    def grow(self, size):
+        """Доводит данные до size постов, комментариев и подписок."""
+        posts = self.author.posts.count()
+        for number in range(posts, size):
+            Post.objects.create(
+                text=f'TestText{number}', author=self.author,
+                group=self.group,
+            )
+        for number in range(self.post.comments.count(), size):
+            Comment.objects.create(
+                post=self.post, author=self.reader,
+                text=f'TestComment{number}',
+            )
+        following = self.reader.follower.count()
+        for number in range(following, size):
+            author = User.objects.create_user(username=f'TestAuthor{number}')
+            Post.objects.create(text='TestText', author=author)
+            Follow.objects.create(user=self.reader, author=author)
+
+    def urls(self):
+        author = {'username': self.author.username}
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug},
+            ),
+            'profile': reverse('posts:profile', kwargs=author),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk},
+            ),
+            'follow_index': reverse('posts:follow_index'),
+            'profile_follow': reverse('posts:profile_follow', kwargs=author),
+            'profile_unfollow': reverse(
+                'posts:profile_unfollow', kwargs=author,
+            ),
+        }
+
+    def test_budgets_at_every_size(self):
+        """Страницы укладываются в бюджет, а запросы не растут с данными."""
+        first = {}
+        for size in SIZES:
+            self.grow(size)
+            for view, path in self.urls().items():
+                client = (
+                    self.fan_client if view in REDIRECTS
+                    else self.reader_client
+                )
+                with self.subTest(view=view, size=size):
+                    queries = self.assertWithinBudget(client, view, path)
+                    self.assertEqual(
+                        queries, first.setdefault(view, queries),
+                        f'{view}: запросы растут с данными',
+                    )
@@ -2,6 +2,7 @@ from http import HTTPStatus
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
 
@@ -44,6 +45,7 @@ class PostsURLTests(TestCase):
         self.authorized_client.force_login(self.user)
         self.author_client = Client()
         self.author_client.force_login(self.user_author)
+        cache.clear()
         self.URLS = {
             reverse('posts:group_list', args=(self.group.slug,)): {
                 'access': 'free',
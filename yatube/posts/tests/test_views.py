@@ -1,16 +1,32 @@
+import os
 import shutil
 import tempfile
+from http import HTTPStatus
+from io import BytesIO
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, Client, override_settings
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
 
+from ..cache import page_cache_stats, page_lock_key
+from ..following import is_following
 from ..forms import PostForm
-from ..models import Post, Group, Follow
+from ..kvstore import kvstore_stats
+from ..models import Comment, FeedEntry, Follow, Group, Post, Profile
+from ..paginators import CursorPaginator
+from ..search import get_backend
+from ..thumbnails import image_variants, ready_pictures
 
 EXPECTED_POST_FORM_FIELDS = {
     'text': forms.CharField,
@@ -267,6 +283,87 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(view=view):
                 self._pagination_testing(url)
 
+    def test_cursor_pagination(self):
+        """Проверяет курсорную пагинацию страницы."""
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as context:
+            first_page = self.authorized_client.get(url + '?cursor=')
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in context.captured_queries
+        ))
+        first_page_obj = first_page.context.get('page_obj')
+        self.assertEqual(len(first_page_obj), settings.POSTS_PER_PAGE)
+        self.assertFalse(first_page_obj.has_previous())
+
+        second_page = self.authorized_client.get(
+            url, {'cursor': first_page_obj.next_cursor},
+        )
+        second_page_obj = second_page.context.get('page_obj')
+        self.assertEqual(len(second_page_obj), settings.POSTS_PER_PAGE)
+        self.assertFalse(second_page_obj.has_next())
+        self.assertEqual(
+            {post.pk for post in first_page_obj}
+            | {post.pk for post in second_page_obj},
+            set(Post.objects.values_list('pk', flat=True)),
+        )
+
+        previous_page = self.authorized_client.get(
+            url, {'cursor': second_page_obj.previous_cursor},
+        )
+        self.assertEqual(
+            list(previous_page.context.get('page_obj')),
+            list(first_page_obj),
+        )
+
+    def test_invalid_cursor(self):
+        """Некорректный курсор приводит к 404."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'invalid'},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_comments_pagination(self):
+        """Комментарии выводятся по порядку порциями по курсору after."""
+        post = Post.objects.create(text='TestText', author=self.user)
+        comments = [
+            Comment.objects.create(post=post, author=self.user, text=str(i))
+            for i in range(3)
+        ]
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with CaptureQueriesContext(connection) as context:
+            first_page = self.authorized_client.get(url)
+        self.assertEqual(
+            sum('posts_comment' in query['sql']
+                for query in context.captured_queries),
+            1,
+        )
+        first_page_obj = first_page.context.get('comments')
+        self.assertEqual(list(first_page_obj), comments[:2])
+        self.assertContains(first_page, first_page_obj.next_cursor)
+
+        second_page = self.authorized_client.get(
+            url, {'after': first_page_obj.next_cursor},
+        )
+        second_page_obj = second_page.context.get('comments')
+        self.assertEqual(list(second_page_obj), comments[2:])
+        self.assertFalse(second_page_obj.has_next())
+
+        response = self.authorized_client.get(url, {'after': 'invalid'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cursor_ordering_must_match_queryset(self):
+        """Порядок queryset, отличный от ключа курсора, — ошибка."""
+        comments = Comment.objects.order_by('created', 'pk')
+        self.assertEqual(
+            CursorPaginator(comments, 2, ordering=('created', 'pk')).ordering,
+            ('created', 'pk'),
+        )
+        with self.assertRaises(ImproperlyConfigured):
+            CursorPaginator(comments, 2)
+        with self.assertRaises(ImproperlyConfigured):
+            CursorPaginator(Post.objects.all(), 2, ordering=('-pub_date',))
+
     def _pagination_testing(self, url):
         first_page_response = self.authorized_client.get(url)
         second_page_response = self.authorized_client.get(url + '?page=2')
@@ -280,6 +377,68 @@ class PaginatorViewsTest(TestCase):
         )
 
 
+class FeedQueriesTests(TestCase):
+    """Тест количества запросов к БД на страницах-лентах."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='TestTitle',
+            slug='test_slug',
+            description='TestDescription',
+        )
+        cls.author = User.objects.create_user(username='TestAuthor')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.create(text='TestText', author=cls.user, group=cls.group)
+        Post.objects.create(text='TestText', author=cls.author)
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list',
+                kwargs={'slug': cls.group.slug},
+            ),
+            'profile': reverse(
+                'posts:profile',
+                kwargs={'username': cls.user.get_username()},
+            ),
+            'follow_index': reverse('posts:follow_index'),
+        }
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(user=self.user)
+        cache.clear()
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов не зависит от количества постов на странице."""
+        single_post_queries = self._count_queries()
+        for i in range(settings.POSTS_PER_PAGE):
+            author = User.objects.create_user(username=f'Author{i}')
+            group = Group.objects.create(
+                title=f'TestTitle{i}',
+                slug=f'test_slug_{i}',
+                description='TestDescription',
+            )
+            Follow.objects.create(user=self.user, author=author)
+            Post.objects.create(text='TestText', author=author, group=group)
+            Post.objects.create(text='TestText', author=self.user, group=group)
+        full_page_queries = self._count_queries()
+        for view, queries in single_post_queries.items():
+            with self.subTest(view=view):
+                self.assertEqual(full_page_queries[view], queries)
+
+    def _count_queries(self):
+        queries = {}
+        for view, url in self.urls.items():
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.authorized_client.get(url)
+            queries[view] = len(context.captured_queries)
+        return queries
+
+
 class CacheViewsTests(TestCase):
     """Тест кеширования."""
 
@@ -299,23 +458,382 @@ class CacheViewsTests(TestCase):
         cache.clear()
 
     def test_cache_index_page(self):
+        """Главная страница берется из кеша до изменения постов."""
         url = self.URLS['index_page']
         response = self._get_response(url)
+        with self.assertNumQueries(0):
+            cached_response = self._get_response(url)
+        self.assertEqual(cached_response.content, response.content)
         self.post.delete()
-        self.assertEqual(
+        self.assertNotEqual(
             self._get_response(url).content,
             response.content,
         )
-        cache.clear()
+
+    def test_stale_page_served_while_rebuilding(self):
+        """Пока страницу пересобирает другой процесс, отдается старая."""
+        post = Post.objects.create(text='TestText', author=self.user)
+        url = self.URLS['index_page']
+        response = self._get_response(url)
+        request = RequestFactory().get(url)
+        request.user = AnonymousUser()
+        lock_key = page_lock_key('feed:index', request)
+        caches['pages'].add(lock_key, True)
+        stale_before = page_cache_stats().get('stale', 0)
+        post.delete()
+        self.assertEqual(self._get_response(url).content, response.content)
+        self.assertEqual(page_cache_stats()['stale'], stale_before + 1)
+        caches['pages'].delete(lock_key)
         self.assertNotEqual(
             self._get_response(url).content,
             response.content,
         )
 
+    def test_rebuild_lock_shared_between_users(self):
+        """Пока страницу пересобирает запрос одного пользователя, другой
+        получает свою старую версию, а не пересобирает ее сам."""
+        post = Post.objects.create(text='TestText', author=self.user)
+        url = self.URLS['index_page']
+        reader = Client()
+        reader.force_login(User.objects.create_user(username='Reader'))
+        response = reader.get(url)
+        request = RequestFactory().get(url)
+        request.user = self.user
+        caches['pages'].add(page_lock_key('feed:index', request), True)
+        stale_before = page_cache_stats().get('stale', 0)
+        post.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(reader.get(url).content, response.content)
+        self.assertEqual(page_cache_stats()['stale'], stale_before + 1)
+
+    def test_cache_paginated_pages_separately(self):
+        """Страницы пагинации кешируются под разными ключами."""
+        Post.objects.bulk_create(
+            Post(text='TestText', author=self.user)
+            for _ in range(settings.POSTS_PER_PAGE)
+        )
+        url = self.URLS['index_page']
+        first_page = self._get_response(url)
+        second_page = self._get_response(url + '?page=2')
+        self.assertEqual(second_page.status_code, HTTPStatus.OK)
+        self.assertNotEqual(first_page.content, second_page.content)
+
+    def test_post_cards_reused(self):
+        """Отрисованные карточки постов берутся из кеша."""
+        url = reverse(
+            'posts:profile',
+            kwargs={'username': self.user.get_username()},
+        )
+        self.assertTemplateUsed(self._get_response(url), 'includes/post.html')
+        self.assertTemplateNotUsed(
+            self._get_response(url), 'includes/post.html',
+        )
+
+    def test_post_card_invalidated_on_change(self):
+        """Изменение поста или автора сразу видно в карточке."""
+        url = reverse(
+            'posts:profile',
+            kwargs={'username': self.user.get_username()},
+        )
+        post = Post.objects.create(text='TestText', author=self.user)
+        self._get_response(url)
+        post.text = 'NewText'
+        post.save()
+        self.assertContains(self._get_response(url), 'NewText')
+        self.user.first_name = 'NewName'
+        self.user.save()
+        self.assertContains(self._get_response(url), 'NewName')
+
+    def test_renamed_pages_not_served_from_cache(self):
+        """После смены slug группы или username старый адрес дает 404."""
+        group = Group.objects.create(title='Title', slug='old_slug')
+        user = User.objects.create_user(username='OldName')
+        old_urls = (
+            reverse('posts:group_list', kwargs={'slug': 'old_slug'}),
+            reverse('posts:profile', kwargs={'username': 'OldName'}),
+        )
+        for url in old_urls:
+            self.assertEqual(self._get_response(url).status_code,
+                             HTTPStatus.OK)
+        group.slug = 'new_slug'
+        group.save()
+        user.username = 'NewName'
+        user.save()
+        for url in old_urls:
+            with self.subTest(url=url):
+                self.assertEqual(self._get_response(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
+
+    def test_post_detail_cached_until_change(self):
+        """Пост подробной страницы берется из кеша до изменения поста,
+        его комментариев или постов автора."""
+        post = Post.objects.create(text='TestText', author=self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self._get_response(url)
+        with self.assertNumQueries(1):
+            self._get_response(url)
+        Comment.objects.create(post=post, author=self.user, text='Comment')
+        self.assertContains(
+            self._get_response(url), 'Комментариев:  <span >1</span>',
+        )
+        posts_count = Profile.objects.get(user=self.user).posts_count
+        Post.objects.create(text='TestText', author=self.user)
+        self.assertContains(
+            self._get_response(url),
+            f'Всего постов автора:  <span >{posts_count + 1}</span>',
+        )
+        post.text = 'NewText'
+        post.save()
+        self.assertContains(self._get_response(url), 'NewText')
+        post.delete()
+        self.assertEqual(
+            self._get_response(url).status_code, HTTPStatus.NOT_FOUND,
+        )
+
+    def test_post_detail_changed_during_query_not_cached(self):
+        """Пост, измененный сразу после чтения из базы, не остается
+        в кеше в старом виде."""
+        post = Post.objects.create(text='TestText', author=self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        changed = []
+
+        def change_after_select(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if not changed and '"posts_profile"' in sql:
+                changed.append(True)
+                post.text = 'NewText'
+                post.save()
+            return result
+
+        with connection.execute_wrapper(change_after_select):
+            self._get_response(url)
+        self.assertEqual(changed, [True])
+        self.assertContains(self._get_response(url), 'NewText')
+
+    def test_post_detail_selected_once_without_cache(self):
+        """Без записи в кеше пост с профилем автора читается один раз."""
+        post = Post.objects.create(text='TestText', author=self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with CaptureQueriesContext(connection) as context:
+            self._get_response(url)
+        self.assertEqual(
+            sum('"posts_profile"' in query['sql']
+                for query in context.captured_queries),
+            1,
+        )
+
     def _get_response(self, url):
         return self.client.get(url)
 
 
+SHARED_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(CACHES={
+    alias: {
+        'BACKEND': settings.CACHE_BACKENDS['file'],
+        'LOCATION': os.path.join(SHARED_CACHE_DIR, alias),
+        'KEY_PREFIX': alias,
+    }
+    for alias in settings.CACHE_ALIASES
+})
+class SharedCacheViewsTests(TestCase):
+    """Тест кеширования на общем для процессов файловом кеше."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(text='TestText', author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(SHARED_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_cached_on_disk(self):
+        """Страница сохраняется в общий кеш и сбрасывается при изменении."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertTrue(os.listdir(os.path.join(SHARED_CACHE_DIR, 'pages')))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, response.content)
+        self.post.delete()
+        self.assertNotEqual(self.client.get(url).content, response.content)
+
+
+THUMBNAIL_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=THUMBNAIL_MEDIA_ROOT)
+class ThumbnailViewsTests(TestCase):
+    """Тест фонового создания миниатюр."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(THUMBNAIL_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюра создается в фоне, вместо нее показана заглушка."""
+        self._create_post()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, '<img class="card-img')
+        self.assertContains(response, 'bg-light')
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_thumbnail_generated_on_upload(self):
+        """Варианты изображения создаются при загрузке и видны в ленте."""
+        self._create_post()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<img class="card-img')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '.webp 2w')
+        self.assertContains(response, '.jpg 2w')
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_page_pictures_fetched_together(self):
+        """Миниатюры страницы читаются из кеша и базы разом."""
+        for color in ('red', 'blue'):
+            self._create_post(self._image(color))
+        images = [post.image for post in Post.objects.all()]
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertNotIn(None, ready_pictures(images))
+        files = [
+            default.backend.thumbnail_file(image, geometry, options)
+            for image in images
+            for geometry, options in image_variants()
+        ]
+        hits = kvstore_stats().get('hits', 0)
+        with self.assertNumQueries(0):
+            self.assertNotIn(None, default.kvstore.get_many(files))
+        self.assertEqual(kvstore_stats()['hits'], hits + len(files))
+
+    def _create_post(self, content=SMALL_GIF):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'TestText',
+                'image': SimpleUploadedFile(
+                    name='TestImage.gif',
+                    content=content,
+                    content_type='image/gif',
+                ),
+            },
+        )
+
+    @staticmethod
+    def _image(color):
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4), color=color).save(buffer, 'GIF')
+        return buffer.getvalue()
+
+
+class SearchViewsTests(TestCase):
+    """Тест поиска по постам."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.other = User.objects.create_user(username='OtherAuthor')
+        cls.group = Group.objects.create(
+            title='TestTitle',
+            slug='test_slug',
+            description='TestDescription',
+        )
+        cls.relevant = Post.objects.create(
+            text='Кот и кот: про котов', author=cls.author, group=cls.group,
+        )
+        cls.other_post = Post.objects.create(
+            text='Кот гуляет сам по себе, а собака нет', author=cls.other,
+        )
+        Post.objects.create(text='Про собак', author=cls.author)
+        cls.url = reverse('posts:search')
+
+    def test_search_ranks_matching_posts(self):
+        """Находятся только подходящие посты, релевантные первыми."""
+        for backend in ('fts5', 'memory'):
+            with self.subTest(backend=backend), \
+                    override_settings(SEARCH_BACKEND=backend):
+                get_backend(backend).rebuild()
+                response = self.client.get(self.url, {'q': 'КОТ'})
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    [self.relevant, self.other_post],
+                )
+
+    def test_search_filters(self):
+        """Результаты фильтруются по группе и автору."""
+        filters = {
+            'group': (self.group.slug, self.relevant),
+            'author': (self.other.username, self.other_post),
+        }
+        for field, (value, post) in filters.items():
+            with self.subTest(field=field):
+                response = self.client.get(
+                    self.url, {'q': 'кот', field: value},
+                )
+                self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов."""
+        post = Post.objects.create(text='Попугай', author=self.author)
+        self.assertEqual(self._search('попугай'), [post])
+        post.text = 'Канарейка'
+        post.save()
+        self.assertEqual(self._search('попугай'), [])
+        self.assertEqual(self._search('канарейка'), [post])
+        post.delete()
+        self.assertEqual(self._search('канарейка'), [])
+
+    def test_search_keyset_pagination(self):
+        """Страницы результатов не пересекаются и покрывают все посты."""
+        Post.objects.bulk_create(
+            Post(text='Страница', author=self.author)
+            for _ in range(settings.POSTS_PER_PAGE + 2)
+        )
+        get_backend().rebuild()
+        first_page = self.client.get(self.url, {'q': 'страница'}).context[
+            'page_obj'
+        ]
+        self.assertEqual(len(first_page), settings.POSTS_PER_PAGE)
+        response = self.client.get(
+            self.url, {'q': 'страница', 'cursor': first_page.next_cursor},
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 2)
+        self.assertFalse(set(first_page) & set(second_page))
+        self.assertContains(response, 'q=%D1%81%D1%82')
+
+    def _search(self, query):
+        response = self.client.get(self.url, {'q': query})
+        return list(response.context['page_obj'])
+
+
 class FollowViewsTests(TestCase):
     """Тест подписки на авторов."""
 
@@ -367,6 +885,46 @@ class FollowViewsTests(TestCase):
             ).exists()
         )
 
+    def test_follow_state_loaded_once(self):
+        """Подписки загружаются одним запросом и обновляются после
+        подписки и отписки."""
+        cache.clear()
+        request = RequestFactory().get('/')
+        request.user = self.user_follower
+        with self.assertNumQueries(1):
+            self.assertFalse(is_following(request, self.user_author))
+            self.assertFalse(is_following(request, self.user_auth.pk))
+        self.client_follower.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.user_author.get_username()}
+            ),
+        )
+        request = RequestFactory().get('/')
+        request.user = self.user_follower
+        self.assertTrue(is_following(request, self.user_author))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(request, self.user_author))
+            template = Template(
+                '{% load follows %}{% is_following author as following %}'
+                '{{ following }}'
+            )
+            self.assertEqual(
+                template.render(Context({
+                    'request': request, 'author': self.user_author,
+                })),
+                'True',
+            )
+        self.client_follower.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.user_author.get_username()}
+            ),
+        )
+        request = RequestFactory().get('/')
+        request.user = self.user_follower
+        self.assertFalse(is_following(request, self.user_author))
+
     def test_post_in_follow_page(self):
         """Пост появляется на странице /posts/follow/"""
         self.client_follower.get(
@@ -382,3 +940,72 @@ class FollowViewsTests(TestCase):
         """Пост не появляется на странице /posts/follow/"""
         response = self.client.get(reverse('posts:follow_index'))
         self.assertNotIn(self.post, response.context.get('page_obj'))
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчика."""
+        Follow.objects.create(user=self.user_follower, author=self.user_author)
+        new_post = Post.objects.create(text='NewText', author=self.user_author)
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.user_follower, post=new_post,
+            ).exists()
+        )
+        response = self.client_follower.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context.get('page_obj')),
+            [new_post, self.post],
+        )
+
+    def test_unfollow_removes_feed_entries(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.user_follower, author=self.user_author)
+        self.client_follower.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.user_author.get_username()}
+            ),
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user_follower).exists()
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=1, BACKGROUND_WORKERS=0)
+    def test_feeds_filled_when_author_stops_being_popular(self):
+        """После отписки, вернувшей автора к раскладке постов, его посты
+        попадают в ленты оставшихся подписчиков."""
+        Follow.objects.create(user=self.user_follower, author=self.user_author)
+        Follow.objects.create(user=self.user_auth, author=self.user_author)
+        new_post = Post.objects.create(text='NewText', author=self.user_author)
+        self.assertFalse(
+            FeedEntry.objects.filter(post=new_post).exists()
+        )
+        self.client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.user_author.get_username()}
+            ),
+        )
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.user_follower,
+            ).values_list('post', flat=True)),
+            {self.post.pk, new_post.pk},
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_posts_read_on_request(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.user_follower, author=self.user_author)
+        new_post = Post.objects.create(text='NewText', author=self.user_author)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user_follower).exists()
+        )
+        for params in ({}, {'cursor': ''}):
+            with self.subTest(params=params):
+                response = self.client_follower.get(
+                    reverse('posts:follow_index'), params,
+                )
+                self.assertEqual(
+                    list(response.context.get('page_obj')),
+                    [new_post, self.post],
+                )
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Comment, Post, TextChange, TextToken
+from .search import tokenize
+from .utils import bulk_create_in_batches
+
+MODELS = {
+    TextToken.POST: Post,
+    TextToken.COMMENT: Comment,
+}
+
+TERM_LENGTH = TextToken._meta.get_field('term').max_length
+
+
+def text_terms(text):
+    """Различные слова текста, обрезанные до длины поля индекса."""
+    return {term[:TERM_LENGTH] for term in tokenize(text)}
+
+
+def tokenize_rows(rows):
+    """Пары (id, слова) для строк (id, текст); выполняется в пуле процессов."""
+    return [(pk, text_terms(text)) for pk, text in rows]
+
+
+def save_tokens(kind, documents):
+    tokens = (
+        TextToken(kind=kind, term=term, object_id=pk)
+        for pk, terms in documents
+        for term in terms
+    )
+    bulk_create_in_batches(
+        TextToken, tokens, settings.TEXT_INDEX_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def log_change(kind, object_id):
+    TextChange.objects.create(kind=kind, object_id=object_id)
+
+
+def apply_changes(batch_size=None, max_batches=None):
+    """Переносит накопленные изменения текстов в индекс пачками.
+
+    Каждая пачка применяется в своей транзакции: слова измененных
+    объектов удаляются и строятся заново по текущему тексту, удаленные
+    объекты просто исчезают из индекса. Возвращает число изменений.
+    """
+    batch_size = batch_size or settings.TEXT_INDEX_BATCH_SIZE
+    applied = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            changes = list(TextChange.objects.order_by('pk')[:batch_size])
+            if not changes:
+                break
+            for kind, model in MODELS.items():
+                ids = {
+                    change.object_id for change in changes
+                    if change.kind == kind
+                }
+                if not ids:
+                    continue
+                TextToken.objects.filter(
+                    kind=kind, object_id__in=ids,
+                ).delete()
+                save_tokens(kind, tokenize_rows(
+                    model.objects.filter(pk__in=ids).values_list(
+                        'pk', 'text',
+                    )
+                ))
+            TextChange.objects.filter(
+                pk__in=[change.pk for change in changes],
+            ).delete()
+        applied += len(changes)
+        batches += 1
+    return applied
+
+
+def matching_ids(kind, query):
+    """Подзапрос id объектов, текст которых содержит все слова query."""
+    terms = text_terms(query)
+    return TextToken.objects.filter(
+        kind=kind, term__in=terms,
+    ).values('object_id').annotate(
+        matched=Count('term'),
+    ).filter(matched=len(terms)).values('object_id')
+
+
+class TextIndexSearchMixin:
+    """Поиск в админке по индексу слов вместо LIKE по всем строкам.
+
+    Перед поиском применяется одна пачка накопленных изменений; при
+    большом отставании индекс догоняет команда apply_text_index.
+    """
+    text_index_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not text_terms(search_term):
+            return super().get_search_results(
+                request, queryset, search_term,
+            )
+        apply_changes(max_batches=1)
+        return queryset.filter(
+            pk__in=matching_ids(self.text_index_kind, search_term),
+        ), False
@@ -0,0 +1,263 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import tokey
+from sorl.thumbnail.images import ImageFile
+
+from .background import submit_on_commit
+from .cache import bump_post_generations
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl для вариантов изображений постов.
+
+    Умеет вычислить имя миниатюры без ее создания и создать несколько
+    миниатюр, открыв исходное изображение один раз.
+    """
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        """Файл миниатюры без обращения к хранилищу и создания."""
+        source = ImageFile(file_)
+        options = self._get_options(source, dict(options))
+        return ImageFile(
+            self._get_thumbnail_filename(source, geometry_string, options),
+            default.storage,
+        )
+
+    def get_thumbnails(self, file_, variants):
+        """Создает недостающие миниатюры для пар (geometry_string, options).
+
+        Возвращает миниатюры в порядке variants.
+        """
+        source = ImageFile(file_)
+        source_image = None
+        thumbnails = []
+        try:
+            for geometry_string, options in variants:
+                options = self._get_options(source, dict(options))
+                thumbnail = ImageFile(
+                    self._get_thumbnail_filename(
+                        source, geometry_string, options,
+                    ),
+                    default.storage,
+                )
+                cached = default.kvstore.get(thumbnail)
+                if cached:
+                    thumbnails.append(cached)
+                    continue
+                if source_image is None:
+                    source_image = default.engine.get_image(source)
+                    source.set_size(
+                        default.engine.get_image_size(source_image)
+                    )
+                    image_info = default.engine.get_image_info(source_image)
+                options['image_info'] = image_info
+                if (thumbnail_settings.THUMBNAIL_FORCE_OVERWRITE
+                        or not thumbnail.exists()):
+                    self._create_thumbnail(
+                        source_image, geometry_string, options, thumbnail,
+                    )
+                    self._create_alternative_resolutions(
+                        source_image, geometry_string, options,
+                        thumbnail.name,
+                    )
+                default.kvstore.get_or_set(source)
+                default.kvstore.set(thumbnail, source)
+                thumbnails.append(thumbnail)
+        finally:
+            if source_image is not None:
+                default.engine.cleanup(source_image)
+        return thumbnails
+
+    def _get_options(self, source, options):
+        # Те же значения по умолчанию, что и в get_thumbnail(): от них
+        # зависит имя файла миниатюры.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+
+def image_variants():
+    """Пары (geometry_string, options) всех вариантов изображения поста.
+
+    Последний формат POST_IMAGE_FORMATS — запасной для браузеров, которые
+    не поддерживают остальные.
+    """
+    ratio_width, ratio_height = settings.POST_IMAGE_ASPECT_RATIO
+    return [
+        (
+            f'{width}x{round(width * ratio_height / ratio_width)}',
+            dict(settings.POST_IMAGE_OPTIONS, format=format_),
+        )
+        for format_ in settings.POST_IMAGE_FORMATS
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def _srcset(thumbnails):
+    widths = {}
+    for thumbnail in thumbnails:
+        # У небольших исходников крупные варианты совпадают по размеру.
+        widths.setdefault(thumbnail.width, thumbnail.url)
+    return ', '.join(f'{url} {width}w' for width, url in widths.items())
+
+
+def _picture(thumbnails):
+    per_format = len(settings.POST_IMAGE_WIDTHS)
+    groups = [
+        thumbnails[start:start + per_format]
+        for start in range(0, len(thumbnails), per_format)
+    ]
+    fallback = groups[-1]
+    default_width = min(
+        settings.POST_IMAGE_WIDTHS,
+        key=lambda width: abs(width - settings.POST_IMAGE_DEFAULT_WIDTH),
+    )
+    return {
+        'sources': [
+            {
+                'type': MIME_TYPES[format_],
+                'srcset': _srcset(group),
+            }
+            for format_, group in zip(
+                settings.POST_IMAGE_FORMATS[:-1], groups[:-1],
+            )
+        ],
+        'src': fallback[
+            settings.POST_IMAGE_WIDTHS.index(default_width)
+        ].url,
+        'srcset': _srcset(fallback),
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
+
+
+def _picture_key(image):
+    options = (
+        image_variants(),
+        settings.POST_IMAGE_DEFAULT_WIDTH,
+        settings.POST_IMAGE_SIZES,
+    )
+    return 'post_image:' + tokey(image.name, repr(options))
+
+
+def ready_pictures(images):
+    """Готовые варианты изображений для тега <picture>, None — еще нет.
+
+    Описания хранятся в кеше, пока не изменятся настройки вариантов;
+    недостающие собираются из хранилища ключей sorl одним запросом.
+    """
+    keys = [_picture_key(image) for image in images]
+    pictures = cache.get_many(keys)
+    missing = [
+        (key, image) for key, image in zip(keys, images)
+        if key not in pictures
+    ]
+    if missing:
+        variants = image_variants()
+        thumbnails = default.kvstore.get_many([
+            default.backend.thumbnail_file(image, geometry_string, options)
+            for _, image in missing
+            for geometry_string, options in variants
+        ])
+        built = {}
+        for index, (key, image) in enumerate(missing):
+            group = thumbnails[
+                index * len(variants):(index + 1) * len(variants)
+            ]
+            if None not in group:
+                built[key] = _picture(group)
+        cache.set_many(built, None)
+        pictures.update(built)
+    return [pictures.get(key) for key in keys]
+
+
+def ready_picture(image):
+    picture, = ready_pictures([image])
+    return picture
+
+
+def prefetch_pictures(posts):
+    """Получает варианты изображений постов страницы разом.
+
+    Результат сохраняется в постах и используется тегом post_picture.
+    """
+    posts = [post for post in posts if post.image]
+    pictures = ready_pictures([post.image for post in posts])
+    for post, picture in zip(posts, pictures):
+        post.prefetched_picture = picture
+
+
+def generate_thumbnails(post):
+    """Создает недостающие варианты изображения поста.
+
+    Возвращает описание для тега <picture>. После создания сбрасываются
+    поколения карточки и лент, чтобы вместо заглушки показалась картинка.
+    """
+    picture = ready_picture(post.image)
+    if picture is not None:
+        return picture
+    default.backend.get_thumbnails(post.image, image_variants())
+    picture = ready_picture(post.image)
+    cache.delete(_job_key(post.image))
+    bump_post_generations(post)
+    return picture
+
+
+def _job_key(image):
+    return f'thumbnail_job:{image.name}'
+
+
+def _generate(post):
+    try:
+        generate_thumbnails(post)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post.pk)
+
+
+def _run_job(post_id):
+    post = Post.objects.only(
+        'image', 'author_id', 'group_id',
+    ).filter(pk=post_id).first()
+    if post is not None and post.image:
+        _generate(post)
+
+
+def schedule_thumbnails(post):
+    """Ставит создание вариантов изображения поста в очередь потоков.
+
+    Задача отправляется после фиксации транзакции, чтобы поток увидел
+    сохраненный пост. Повторная постановка того же изображения
+    пропускается, пока задача не выполнена или не истек
+    THUMBNAIL_JOB_TIMEOUT. При BACKGROUND_WORKERS = 0 миниатюры создаются
+    сразу в текущем потоке.
+    """
+    if not post.image:
+        return
+    if not cache.add(_job_key(post.image), True,
+                     settings.THUMBNAIL_JOB_TIMEOUT):
+        return
+    if not settings.BACKGROUND_WORKERS:
+        _generate(post)
+        return
+    submit_on_commit(_run_job, post.pk)
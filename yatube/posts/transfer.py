@@ -0,0 +1,284 @@
+import gzip
+import io
+import json
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.core.management.color import no_style
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+from .utils import bulk_create_in_batches
+
+# Поля записей NDJSON и соответствующие им поля выборки. Записи идут в
+# порядке словаря: группы и посты раньше ссылающихся на них записей.
+FIELDS = {
+    'group': {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    },
+    'post': {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comment': {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    'follow': {
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+
+MODELS = {
+    'group': Group,
+    'post': Post,
+    'comment': Comment,
+    'follow': Follow,
+}
+
+
+class RecordError(ValueError):
+    """Некорректная запись во входном файле."""
+
+
+@contextmanager
+def open_ndjson(path, mode, compress=False):
+    """Текстовый поток NDJSON в кодировке UTF-8.
+
+    path '-' означает stdin или stdout. Поток сжимается gzip, если
+    задан compress или имя файла оканчивается на .gz.
+    """
+    if path == '-':
+        raw = sys.stdout.buffer if mode == 'w' else sys.stdin.buffer
+    else:
+        raw = open(path, f'{mode}b')
+    binary = raw
+    if compress or path.endswith('.gz'):
+        binary = gzip.GzipFile(fileobj=raw, mode=f'{mode}b')
+    stream = io.TextIOWrapper(binary, encoding='utf-8')
+    try:
+        yield stream
+    finally:
+        stream.flush()
+        stream.detach()
+        if binary is not raw:
+            binary.close()
+        if path == '-':
+            raw.flush()
+        else:
+            raw.close()
+
+
+@contextmanager
+def keep_auto_dates(model):
+    """Сохраняет даты из файла в полях с auto_now_add."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def export_lines(chunk_size=2000):
+    """Строки NDJSON со всеми группами, постами, комментариями и подписками.
+
+    Каждая модель читается одним потоковым запросом; пользователи и группы
+    записываются по username и slug.
+    """
+    for kind, fields in FIELDS.items():
+        rows = MODELS[kind].objects.order_by('pk').values_list(
+            *fields.values(),
+        ).iterator(chunk_size=chunk_size)
+        for row in rows:
+            record = {'model': kind, **dict(zip(fields, row))}
+            yield json.dumps(record, ensure_ascii=False, default=_encode)
+
+
+class Loader:
+    """Загружает строки NDJSON пачками через bulk_create.
+
+    Пользователи находятся по username, недостающие создаются без пароля;
+    группы — по slug, существующие группы не меняются. Посты и комментарии
+    сохраняют id из файла, как при loaddata. Сигналы не вызываются, поэтому
+    счетчики, ленты и индексы после загрузки нужно пересобрать.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.counts = Counter()
+        self.user_ids = {}
+        self.group_ids = {}
+        self.changed_user_ids = set()
+        self.post_ids = set()
+        self.commented_post_ids = set()
+        self.follower_ids = set()
+
+    def load(self, lines):
+        kind, batch = None, []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record_kind = record.pop('model')
+                if record_kind not in MODELS:
+                    raise KeyError(record_kind)
+            except (ValueError, KeyError, AttributeError, TypeError):
+                raise RecordError(f'Строка {number}: некорректная запись.')
+            if record_kind != kind or len(batch) >= self.batch_size:
+                self.flush(kind, batch)
+                kind, batch = record_kind, []
+            batch.append((number, record))
+        self.flush(kind, batch)
+        self.reset_sequences()
+
+    def flush(self, kind, batch):
+        if not batch:
+            return
+        try:
+            objects = getattr(self, f'build_{kind}s')(
+                [record for _, record in batch]
+            )
+        except RecordError:
+            raise
+        except (KeyError, TypeError, ValueError) as error:
+            raise RecordError(
+                f'Строки {batch[0][0]}–{batch[-1][0]}: '
+                f'некорректная запись {kind}: {error!r}.'
+            )
+        with keep_auto_dates(MODELS[kind]):
+            bulk_create_in_batches(
+                MODELS[kind], objects, self.batch_size,
+                ignore_conflicts=kind in ('group', 'follow'),
+            )
+        self.counts[kind] += len(batch)
+
+    def build_groups(self, records):
+        return [
+            Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record['description'],
+            )
+            for record in records
+        ]
+
+    def build_posts(self, records):
+        users = self.resolve_users(record['author'] for record in records)
+        groups = self.resolve_groups(
+            record['group'] for record in records if record['group']
+        )
+        posts = [
+            Post(
+                pk=record['id'],
+                author_id=users[record['author']],
+                group_id=groups.get(record['group']),
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+                image=record['image'],
+            )
+            for record in records
+        ]
+        self.changed_user_ids.update(post.author_id for post in posts)
+        self.post_ids.update(post.pk for post in posts)
+        return posts
+
+    def build_comments(self, records):
+        users = self.resolve_users(record['author'] for record in records)
+        comments = [
+            Comment(
+                pk=record['id'],
+                post_id=record['post'],
+                author_id=users[record['author']],
+                text=record['text'],
+                created=parse_datetime(record['created']),
+            )
+            for record in records
+        ]
+        self.commented_post_ids.update(
+            comment.post_id for comment in comments
+        )
+        return comments
+
+    def build_follows(self, records):
+        users = self.resolve_users(
+            username for record in records
+            for username in (record['user'], record['author'])
+        )
+        follows = [
+            Follow(
+                user_id=users[record['user']],
+                author_id=users[record['author']],
+            )
+            for record in records
+        ]
+        self.changed_user_ids.update(
+            user_id for follow in follows
+            for user_id in (follow.user_id, follow.author_id)
+        )
+        self.follower_ids.update(follow.user_id for follow in follows)
+        return follows
+
+    def resolve_users(self, usernames):
+        missing = set(usernames) - self.user_ids.keys()
+        if missing:
+            self.user_ids.update(User.objects.filter(
+                username__in=missing,
+            ).values_list('username', 'pk'))
+            new = missing - self.user_ids.keys()
+            users = [User(username=username) for username in new]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users)
+            self.user_ids.update(User.objects.filter(
+                username__in=new,
+            ).values_list('username', 'pk'))
+            self.counts['user'] += len(new)
+        return self.user_ids
+
+    def resolve_groups(self, slugs):
+        missing = set(slugs) - self.group_ids.keys()
+        if missing:
+            self.group_ids.update(Group.objects.filter(
+                slug__in=missing,
+            ).values_list('slug', 'pk'))
+            unknown = missing - self.group_ids.keys()
+            if unknown:
+                raise RecordError(
+                    f'Неизвестные группы: {", ".join(sorted(unknown))}.'
+                )
+        return self.group_ids
+
+    def reset_sequences(self):
+        """Сдвигает автоинкременты за id, загруженные из файла."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment],
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -10,6 +10,11 @@ urlpatterns = [
         views.IndexListView.as_view(),
         name='index'
     ),
+    path(
+        'search/',
+        views.SearchView.as_view(),
+        name='search'
+    ),
     path(
         'create/',
         views.PostCreateView.as_view(),
@@ -1,6 +1,28 @@
+from itertools import islice
+
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import redirect
 from django.views.generic.detail import SingleObjectMixin
 
+from .paginators import CursorPaginator, InvalidCursor
+
+
+def bulk_create_in_batches(model, objs, size, **kwargs):
+    """Вставляет объекты через bulk_create пачками не больше size.
+
+    Пачки режутся здесь, а не параметром batch_size: в Django 2.2 он
+    отменяет ограничение бэкенда на размер вставки (у SQLite — 500 строк
+    в составном SELECT), а без него bulk_create сам делит пачку под это
+    ограничение. Генератор objs читается по одной пачке, а не целиком.
+    """
+    objs = iter(objs)
+    while True:
+        batch = list(islice(objs, size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch, **kwargs)
+
 
 class AuthorRequiredMixin(SingleObjectMixin):
     def dispatch(self, request, *args, **kwargs):
@@ -8,3 +30,32 @@ class AuthorRequiredMixin(SingleObjectMixin):
         if obj.author != request.user:
             return redirect(obj)
         return super().dispatch(request, *args, **kwargs)
+
+
+class CursorPaginationMixin:
+    """Курсорная пагинация для лент.
+
+    Включается настройкой FEED_CURSOR_PAGINATION или параметром
+    ?cursor= в запросе, иначе используется обычная постраничная.
+    """
+    cursor_kwarg = 'cursor'
+
+    def use_cursor_pagination(self):
+        return (settings.FEED_CURSOR_PAGINATION
+                or self.cursor_kwarg in self.request.GET)
+
+    def get_cursor_ordering(self, queryset):
+        """Поля ключа курсора; None — ключ CursorPaginator по умолчанию."""
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(
+            queryset, page_size, ordering=self.get_cursor_ordering(queryset),
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -1,23 +1,29 @@
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.generic.base import RedirectView
+from django.views.generic.base import RedirectView, TemplateView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView
 from django.views.generic.list import ListView
 
-from .forms import PostForm, CommentForm
+from .cache import cache_feed_page, get_post_detail
+from .feed import cursor_ordering, feed_posts, follow_feed
+from .following import is_following
+from .forms import PostForm, CommentForm, SearchForm
 from .models import Post, Group, User, Follow
-from .utils import AuthorRequiredMixin
+from .paginators import CursorPaginator, InvalidCursor, SearchPaginator
+from .search import get_backend, tokenize
+from .thumbnails import schedule_thumbnails
+from .utils import AuthorRequiredMixin, CursorPaginationMixin
 
 
-@method_decorator(cache_page(20, key_prefix='index_page'), name='dispatch')
-class IndexListView(ListView):
+@method_decorator(cache_feed_page('feed:index'), name='dispatch')
+class IndexListView(CursorPaginationMixin, ListView):
     """Главная страница, на которой отображаются все посты пользователей."""
-    model = Post
+    queryset = Post.objects.for_feed()
     paginate_by = settings.POSTS_PER_PAGE
     template_name = 'posts/index.html'
 
@@ -27,14 +33,15 @@ class IndexListView(ListView):
         return context
 
 
-class GroupListView(ListView):
+@method_decorator(cache_feed_page('feed:group:{slug}'), name='dispatch')
+class GroupListView(CursorPaginationMixin, ListView):
     """Страница с постами определенной группы."""
     paginate_by = settings.POSTS_PER_PAGE
     template_name = 'posts/group_list.html'
 
     def get_queryset(self):
         self.group = get_object_or_404(Group, slug=self.kwargs['slug'])
-        return self.group.posts.all()
+        return self.group.posts.for_feed()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -42,44 +49,88 @@ class GroupListView(ListView):
         return context
 
 
-class ProfileListView(ListView):
+@method_decorator(
+    cache_feed_page('feed:profile:{username}'), name='dispatch',
+)
+class ProfileListView(CursorPaginationMixin, ListView):
     """Страница-profile определенного юзера."""
     paginate_by = settings.POSTS_PER_PAGE
     template_name = 'posts/profile.html'
 
     def get_queryset(self):
-        self.author = get_object_or_404(User, username=self.kwargs['username'])
-        return self.author.posts.all()
+        self.author = get_object_or_404(
+            User.objects.select_related('profile'),
+            username=self.kwargs['username'],
+        )
+        return self.author.posts.for_feed()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['author'] = self.author
-        context['following'] = self.is_follow()
+        context['following'] = is_following(self.request, self.author)
         return context
 
-    def is_follow(self) -> bool:
-        if not self.request.user.is_authenticated:
-            return False
-        return Follow.objects.filter(
-            user=self.request.user,
-            author=self.author,
-        ).exists()
-
 
 class PostDetailView(DetailView):
     """Подробная страница определенного поста."""
-    model = Post
     template_name = 'posts/post_detail.html'
     context_object_name = 'post'
     pk_url_kwarg = 'post_id'
 
+    def get_object(self, queryset=None):
+        post = get_post_detail(self.kwargs[self.pk_url_kwarg])
+        if post is None:
+            raise Http404('Пост не найден')
+        return post
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.all()
+        paginator = CursorPaginator(
+            self.object.comments.select_related('author'),
+            settings.COMMENTS_PER_PAGE,
+            ordering=('created', 'pk'),
+        )
+        try:
+            context['comments'] = paginator.page(
+                self.request.GET.get('after'),
+            )
+        except InvalidCursor as e:
+            raise Http404(str(e))
         context['form'] = CommentForm()
         return context
 
 
+class SearchView(TemplateView):
+    """Поиск по текстам постов с фильтрами по группе и автору."""
+    template_name = 'posts/search.html'
+    paginate_by = settings.POSTS_PER_PAGE
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = SearchForm(self.request.GET or None)
+        terms, filters = [], {}
+        if form.is_valid():
+            terms = tokenize(form.cleaned_data['q'])
+            for field in ('group', 'author'):
+                if form.cleaned_data[field] is not None:
+                    filters[f'{field}_id'] = form.cleaned_data[field].pk
+        paginator = SearchPaginator(
+            get_backend(), terms, self.paginate_by, **filters,
+        )
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        query = self.request.GET.copy()
+        query.pop('cursor', None)
+        context.update({
+            'form': form,
+            'page_obj': page,
+            'pagination_query': query.urlencode(),
+        })
+        return context
+
+
 class PostCreateView(LoginRequiredMixin, CreateView):
     """Страница создания нового поста."""
     template_name = 'posts/create_post.html'
@@ -93,7 +144,9 @@ class PostCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        schedule_thumbnails(self.object)
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -108,6 +161,12 @@ class PostEditView(LoginRequiredMixin, AuthorRequiredMixin, UpdateView):
     form_class = PostForm
     pk_url_kwarg = 'post_id'
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if 'image' in form.changed_data:
+            schedule_thumbnails(self.object)
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['is_edit'] = True
@@ -126,14 +185,24 @@ class AddCommentView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class FollowListView(LoginRequiredMixin, ListView):
+class FollowListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Страница с постами авторов, на который подписан пользователь."""
     model = Post
     paginate_by = settings.POSTS_PER_PAGE
     template_name = 'posts/follow.html'
 
     def get_queryset(self):
-        return Post.objects.filter(author__following__user=self.request.user)
+        return follow_feed(self.request.user)
+
+    def get_cursor_ordering(self, queryset):
+        return cursor_ordering(queryset)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = (
+            super().paginate_queryset(queryset, page_size)
+        )
+        page.object_list = feed_posts(object_list)
+        return paginator, page, page.object_list, is_paginated
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -51,6 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilerMiddleware',
+    'core.middleware.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,12 +68,107 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Metrics
+
+# Доля запросов с подробными замерами и заголовком Server-Timing.
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0.01))
+
+# Границы гистограммы времени ответа, секунды.
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Адреса, с которых доступна страница /metrics/.
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
+# Profiling
+
+# Стеки запросов снимаются только при PROFILER_ENABLED=1.
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED') == '1'
+
+# Профиль сохраняется для запросов дольше порога, секунды, и для
+# случайной доли PROFILER_SAMPLE_RATE остальных.
+PROFILER_SLOW_THRESHOLD = float(os.getenv('PROFILER_SLOW_THRESHOLD', 1))
+
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0.001))
+
+# Интервал снятия стеков, секунды.
+PROFILER_INTERVAL = 0.005
+
+# Каталог профилей; самые старые удаляются сверх PROFILER_MAX_FILES.
+PROFILER_DIR = os.getenv('PROFILER_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+PROFILER_MAX_FILES = 1000
+
+# Query log
+
+# Доля запросов, обращения которых к базе попадают в журнал; по
+# умолчанию журнал выключен.
+QUERYLOG_SAMPLE_RATE = float(os.getenv('QUERYLOG_SAMPLE_RATE', 0))
+
+# Запросы дольше порога, секунды, пишутся в лог core.querylog.
+QUERYLOG_SLOW_THRESHOLD = 0.1
+
+# Сколько раз один отпечаток должен выполниться за запрос, чтобы
+# считаться N+1.
+QUERYLOG_N_PLUS_ONE = 10
+
+# Сколько длительностей каждого отпечатка хранить для перцентилей.
+QUERYLOG_RESERVOIR = 500
+
+# Каталог и период записи статистики процессов для query_report.
+QUERYLOG_DIR = os.getenv('QUERYLOG_DIR', os.path.join(BASE_DIR, 'querylog'))
+
+QUERYLOG_FLUSH_INTERVAL = 60
+
+# Cache
+# CACHE_BACKEND: locmem (по умолчанию, отдельный кеш в каждом процессе),
+# file (общий для процессов каталог CACHE_LOCATION), redis (нужен пакет
+# django-redis, CACHE_LOCATION вида redis://127.0.0.1:6379/1) или путь
+# к классу бэкенда.
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache'),
+)
+
+# default — поколения и служебные ключи, pages — страницы лент,
+# fragments — карточки постов, sessions — сессии пользователей.
+CACHE_ALIASES = ('default', 'pages', 'fragments', 'sessions')
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    alias: {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': {
+            'locmem': alias,
+            'file': os.path.join(CACHE_LOCATION, alias),
+        }.get(CACHE_BACKEND, CACHE_LOCATION),
+        'KEY_PREFIX': alias,
     }
+    for alias in CACHE_ALIASES
 }
 
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+POST_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+FOLLOWING_CACHE_TIMEOUT = 60 * 60 * 24
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько после истечения FEED_CACHE_TIMEOUT или смены поколения можно
+# отдавать предыдущую версию страницы, пока ее пересобирает другой процесс.
+FEED_CACHE_STALE_TIMEOUT = 60 * 60
+
+FEED_CACHE_LOCK_TIMEOUT = 10
+
+FEED_CACHE_LOCK_POLL_INTERVAL = 0.05
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -105,6 +203,11 @@ DATABASES = {
 }
 
 
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+SESSION_CACHE_ALIAS = 'sessions'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -149,6 +252,59 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Изображения постов хранятся под именами по хешу содержимого.
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+
+
+# Post images
+
+# Загруженные изображения уменьшаются до этого размера большей стороны
+# и перекодируются с качеством POST_IMAGE_QUALITY.
+POST_IMAGE_MAX_DIMENSION = 1920
+
+POST_IMAGE_QUALITY = 85
+
+# Изображения с большим числом пикселей отклоняются до декодирования.
+POST_IMAGE_MAX_PIXELS = 8000 * 5000
+
+
+# Thumbnails
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.PostThumbnailBackend'
+
+# Описания миниатюр хранятся в общем кеше и записываются в базу данных.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+THUMBNAIL_CACHE = 'default'
+
+# Для каждого изображения поста создаются варианты всех ширин в каждом
+# формате; последний формат — запасной для тега <img>.
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
+
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+POST_IMAGE_ASPECT_RATIO = (960, 339)
+
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': False}
+
+# Ширина варианта в атрибуте src для браузеров без поддержки srcset.
+POST_IMAGE_DEFAULT_WIDTH = 960
+
+POST_IMAGE_SIZES = '(min-width: 1200px) 1140px, 100vw'
+
+# Число потоков фоновых задач (posts.background): создание миниатюр
+# загруженных изображений, заполнение лент подписчиков; при 0 эта работа
+# выполняется сразу в потоке запроса.
+BACKGROUND_WORKERS = int(
+    os.getenv('BACKGROUND_WORKERS', os.getenv('THUMBNAIL_WORKERS', 2))
+)
+# Прежнее имя BACKGROUND_WORKERS, оставлено для совместимости.
+THUMBNAIL_WORKERS = BACKGROUND_WORKERS
+
+# Сколько не ставить повторно в очередь изображение, миниатюру которого
+# не удалось создать.
+THUMBNAIL_JOB_TIMEOUT = 60 * 10
+
 # User authentication
 
 LOGIN_URL = 'users:login'
@@ -169,6 +325,30 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
 
+# Комментарии к посту выводятся порциями с кнопкой «Следующие».
+COMMENTS_PER_PAGE = 50
+
+FEED_CURSOR_PAGINATION = False
+
+
+# Follow feed
+
+# Посты авторов, у которых подписчиков больше, не раскладываются
+# по лентам при публикации, а читаются при открытии ленты.
+FEED_FANOUT_LIMIT = 10000
+
+FEED_FANOUT_BATCH_SIZE = 1000
+
+
+# Search
+
+# fts5 — таблица SQLite FTS5, memory — индекс в памяти процесса,
+# auto — FTS5, если таблица индекса есть в базе.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+# Размер пачки изменений и вставок индекса поиска админки.
+TEXT_INDEX_BATCH_SIZE = 1000
+
 
 # Testing
 